@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger('quiz')
+
+
+# Function to read the last n lines of a file by scanning backwards from the end
+def _tail_lines(path, n, block_size=8192):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= n:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-n:]
+
+
+# Append-only stream of user activity events (JSONL on disk) with the newest
+# events held in a bounded ring buffer, so reading the feed never touches the logs
+class ActivityFeed:
+    def __init__(self, path, capacity=1000, max_bytes=5 * 1024 * 1024):
+        self.path = path
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            for line in _tail_lines(path, capacity):
+                try:
+                    self._events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping unreadable activity event")
+
+    def __len__(self):
+        return len(self._events)
+
+    # Record an event such as record("chat") or record("quiz", quiz_id=..., percentage=...)
+    def record(self, event_type, **fields):
+        event = {"type": event_type, "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **fields}
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._events.append(event)
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                if os.path.getsize(self.path) > self.max_bytes:
+                    self._truncate()
+            except OSError as e:
+                logger.error(f"Failed to write activity event: {e}")
+        return event
+
+    # Keep only the events still in the ring buffer; the caller holds the lock
+    def _truncate(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for event in self._events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    # Newest events first
+    def recent(self, limit=None):
+        with self._lock:
+            events = list(self._events)
+        events.reverse()
+        return events[:limit] if limit else events
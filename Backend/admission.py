@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Raised when a request cannot be admitted; the route answers 429 with Retry-After
+class Overloaded(Exception):
+    def __init__(self, message, retry_after, queue_length=None):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.queue_length = queue_length
+
+
+# A request's place in an admission queue; holds a slot once admitted
+class Ticket:
+    def __init__(self, lane):
+        self.lane = lane
+        self.position = 0
+        self.waited = 0.0
+        self.admitted_at = None
+        self._released = False
+        self._handed_off = False
+
+    def release(self):
+        if self._released or self.admitted_at is None:
+            return
+        self._released = True
+        self.lane.release(time.time() - self.admitted_at)
+
+    # Keep the slot until a streamed response has been sent, instead of until the route returns
+    def hand_off(self, response):
+        self._handed_off = True
+        response.call_on_close(self.release)
+        return response
+
+
+# Concurrency slots for one kind of work with a bounded FIFO wait queue
+class AdmissionLane:
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_seconds = None
+        self._condition = threading.Condition()
+
+    # Seconds until a newcomer behind `ahead` waiting requests would likely get a slot
+    def _estimated_wait(self, ahead):
+        avg_seconds = self.avg_seconds or 10.0
+        return avg_seconds * (ahead + 1) / self.max_concurrent
+
+    def enter(self, timeout=None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        ticket = Ticket(self)
+        start = time.time()
+        with self._condition:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+            else:
+                if len(self.waiting) >= self.max_queue:
+                    self.rejected += 1
+                    raise Overloaded(f"Too many {self.name} requests in progress, please retry shortly",
+                                     self._estimated_wait(len(self.waiting)), len(self.waiting))
+                ticket.position = len(self.waiting) + 1
+                self.waiting.append(ticket)
+                deadline = start + timeout
+                while self.waiting[0] is not ticket or self.active >= self.max_concurrent:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.waiting.remove(ticket)
+                        self.rejected += 1
+                        self._condition.notify_all()
+                        raise Overloaded(f"Timed out waiting for a free {self.name} slot",
+                                         self._estimated_wait(len(self.waiting)), len(self.waiting))
+                    self._condition.wait(remaining)
+                self.waiting.popleft()
+                self.active += 1
+                self._condition.notify_all()
+            self.admitted += 1
+        ticket.waited = time.time() - start
+        ticket.admitted_at = time.time()
+        return ticket
+
+    def release(self, seconds):
+        with self._condition:
+            self.active -= 1
+            self.avg_seconds = seconds if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * seconds
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self.active,
+                "waiting": len(self.waiting),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 2) if self.avg_seconds is not None else None
+            }
+
+
+# Token-bucket rate limit per (kind, client key); idle buckets are dropped once they refill
+class RateLimiter:
+    def __init__(self, limits, prune_every=1000):
+        # limits: {kind: (requests_per_minute, burst)}
+        self.limits = limits
+        self.prune_every = prune_every
+        self._buckets = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    # Returns 0 if the request may go ahead, otherwise the seconds until it would be allowed
+    def check(self, kind, key):
+        if kind not in self.limits:
+            return 0
+        per_minute, burst = self.limits[kind]
+        if per_minute <= 0:
+            return 0
+        rate = per_minute / 60.0
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get((kind, key), (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[(kind, key)] = (tokens, now)
+                return (1 - tokens) / rate
+            self._buckets[(kind, key)] = (tokens - 1, now)
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                self._prune(now)
+        return 0
+
+    def _prune(self, now):
+        for bucket_key, (tokens, updated) in list(self._buckets.items()):
+            per_minute, burst = self.limits[bucket_key[0]]
+            if tokens + (now - updated) * per_minute / 60.0 >= burst:
+                del self._buckets[bucket_key]
+
+
+# Admission for expensive routes: per-client rate limits first, then a concurrency slot per kind.
+# Requests wait in a bounded queue for a slot; a full queue or a long wait is rejected right away
+# so that the admitted requests finish quickly instead of every request slowing down.
+class AdmissionController:
+    def __init__(self, lanes, rate_limiter):
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.rate_limiter = rate_limiter
+
+    def check_rate(self, kind, client_key):
+        retry_after = self.rate_limiter.check(kind, client_key)
+        if retry_after:
+            raise Overloaded(f"Rate limit exceeded for {kind} requests, please slow down", retry_after)
+
+    @contextmanager
+    def admit(self, kind, client_key, timeout=None):
+        self.check_rate(kind, client_key)
+        ticket = self.lanes[kind].enter(timeout)
+        try:
+            yield ticket
+        finally:
+            if not ticket._handed_off:
+                ticket.release()
+
+    # Every admitted or waiting request holds a server thread. Shrink the wait queues (and, if even
+    # the slots do not fit, the slots) so that together they never need more than max_threads.
+    # Returns True if any lane was changed.
+    def limit_threads(self, max_threads):
+        lanes = list(self.lanes.values())
+        if sum(lane.max_concurrent + lane.max_queue for lane in lanes) <= max_threads:
+            return False
+        concurrent = sum(lane.max_concurrent for lane in lanes)
+        if concurrent >= max_threads:
+            for lane in lanes:
+                lane.max_queue = 0
+                lane.max_concurrent = max(1, lane.max_concurrent * max_threads // concurrent)
+        else:
+            queued = sum(lane.max_queue for lane in lanes)
+            for lane in lanes:
+                lane.max_queue = lane.max_queue * (max_threads - concurrent) // queued
+        return True
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
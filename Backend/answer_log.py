@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger('quiz')
+
+
+# Append-only log of submitted answers, one JSONL file per quiz.
+# Answers are folded into the stored quiz when the log is compacted.
+class AnswerLog:
+    def __init__(self, directory, compact_every=20):
+        self.directory = directory
+        self.compact_every = compact_every
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, quiz_id):
+        if not re.fullmatch(r'[\w-]+', quiz_id):
+            raise ValueError(f"Invalid quiz id: {quiz_id}")
+        return os.path.join(self.directory, f"{quiz_id}.jsonl")
+
+    # Append answers given as {"question_index": int, "user_answer": str} dicts; returns the log length
+    def append(self, quiz_id, answers):
+        with open(self._path(quiz_id), 'a', encoding='utf-8') as f:
+            for answer in answers:
+                f.write(json.dumps(answer, ensure_ascii=False) + '\n')
+        return len(self.read(quiz_id))
+
+    def read(self, quiz_id):
+        filepath = self._path(quiz_id)
+        if not os.path.exists(filepath):
+            return []
+        answers = []
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    answers.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; earlier entries are still valid
+                    logger.warning(f"Skipping unreadable answer log entry for {quiz_id}")
+        return answers
+
+    def clear(self, quiz_id):
+        filepath = self._path(quiz_id)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    # Fold the logged answers into the stored quiz with apply(quiz_data, answers), then clear the log.
+    # The log is applied whatever the current write mode is; the caller must hold the quiz lock.
+    def compact(self, quiz_id, store, apply):
+        answers = self.read(quiz_id)
+        if answers:
+            quiz_data = store.get(quiz_id)
+            if quiz_data is not None:
+                store.save(quiz_id, apply(quiz_data, answers))
+        self.clear(quiz_id)
+        return len(answers)
+
+    def needs_compaction(self, log_length):
+        return log_length >= self.compact_every
+
+    def pending_quiz_ids(self):
+        return [f[:-len('.jsonl')] for f in os.listdir(self.directory) if f.endswith('.jsonl')]
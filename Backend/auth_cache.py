@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Small in-memory LRU with a time-to-live per entry, for verified tokens and user profiles.
+# Entries expire after ttl_seconds or at their own expires_at (epoch seconds), whichever is first.
+class TTLCache:
+    def __init__(self, max_entries=10000, ttl_seconds=60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value, expires_at=None):
+        if self.ttl_seconds <= 0:
+            return
+        deadline = time.time() + self.ttl_seconds
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.counters["invalidations"] += 1
+
+    # Drop every entry whose value matches; used to forget all cached tokens of one user
+    def pop_where(self, predicate):
+        with self._lock:
+            keys = [key for key, (value, _) in self._entries.items() if predicate(value)]
+            for key in keys:
+                del self._entries[key]
+            self.counters["invalidations"] += len(keys)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        return stats
@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompts  # noqa: E402
+from model_profiles import load_profile, output_cap  # noqa: E402
+from quiz_parser import parse_questions  # noqa: E402
+
+# Compare each task's model profile with the old shared settings (mistral:latest, num_ctx=2048,
+# temperature=0.7, no output cap) on the same prompts the app uses. Reports latency, output tokens,
+# generation speed, how often the output hit the num_predict cap, and a quality check per task:
+# valid questions out of those asked for, or summary length within the prompt's target.
+#
+#   python benchmarks/bench_model_profiles.py [--url http://127.0.0.1:11434] [--runs 3] [--tasks chat,mcq]
+#
+# Profiles are read from the environment exactly as the app reads them, so the effect of e.g.
+# CHAT_MODEL=mistral:7b-instruct-q4_K_M can be measured before deploying it.
+
+BASELINE = {"model": "mistral:latest", "num_ctx": 2048, "num_predict": None, "temperature": 0.7}
+QUIZ_TYPES = {"mcq": prompts.MCQ_PROMPT, "true_false": prompts.TRUE_FALSE_PROMPT,
+              "fill_in_the_blank": prompts.FILL_IN_THE_BLANK_PROMPT}
+SAMPLE_MATERIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_material.txt')
+
+
+def build_prompt(task, material, num_questions):
+    if task == 'chat':
+        return prompts.CHAT_PROMPT.format(question="Explain the difference between the light-dependent reactions and the Calvin cycle.")
+    if task in ('summarize', 'summarize_chunk'):
+        template = prompts.SUMMARIZE_PROMPT if task == 'summarize' else prompts.SUMMARIZE_CHUNK_PROMPT
+        return template.format(text=material)
+    return QUIZ_TYPES[task].format(num_questions=num_questions, difficulty='medium', material=material, exclude='none')
+
+
+# Function to score one response; returns a number between 0 and 1
+def quality(task, text, num_questions):
+    if task in QUIZ_TYPES:
+        questions, _ = parse_questions(text, task)
+        return min(len(questions), num_questions) / num_questions
+    words = len(text.split())
+    if task == 'summarize':
+        return 1.0 if 300 <= words <= 400 else max(0.0, 1 - min(abs(words - 300), abs(words - 400)) / 300)
+    if task == 'summarize_chunk':
+        return 1.0 if words <= 150 else max(0.0, 1 - (words - 150) / 150)
+    return 1.0 if words else 0.0
+
+
+def run_once(url, task, profile, prompt, num_questions):
+    options = {"num_ctx": profile["num_ctx"], "temperature": profile["temperature"]}
+    if task in QUIZ_TYPES and profile is not BASELINE:
+        cap = output_cap(task, num_questions)
+        options["num_predict"] = min(cap, profile["num_predict"]) if profile["num_predict"] else cap
+    elif profile["num_predict"]:
+        options["num_predict"] = profile["num_predict"]
+    payload = {"model": profile["model"], "messages": [{"role": "user", "content": prompt}],
+               "stream": False, "options": options}
+    if task in QUIZ_TYPES:
+        payload["format"] = "json"
+
+    request = urllib.request.Request(f"{url.rstrip('/')}/api/chat", data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=900) as response:
+        result = json.loads(response.read().decode('utf-8'))
+    seconds = time.perf_counter() - start
+    text = result.get("message", {}).get("content", "")
+    tokens = result.get("eval_count", 0)
+    eval_seconds = result.get("eval_duration", 0) / 1e9
+    return {
+        "seconds": seconds,
+        "tokens": tokens,
+        "tokens_per_second": tokens / eval_seconds if eval_seconds else 0.0,
+        "capped": result.get("done_reason") == "length",
+        "quality": quality(task, text, num_questions)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-task model profiles against the shared baseline")
+    parser.add_argument('--url', default=os.getenv("OLLAMA_BASE_URLS", "http://127.0.0.1:11434").split(',')[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--num-questions', type=int, default=5)
+    parser.add_argument('--tasks', default='chat,summarize,summarize_chunk,mcq,true_false,fill_in_the_blank')
+    parser.add_argument('--material', default=SAMPLE_MATERIAL)
+    args = parser.parse_args()
+
+    with open(args.material, 'r', encoding='utf-8') as f:
+        material = f.read()
+
+    print(f"{'task':<18} {'config':<9} {'model':<28} {'latency s':>9} {'tokens':>7} {'tok/s':>7} {'capped':>7} {'quality':>8}")
+    for task in args.tasks.split(','):
+        prompt = build_prompt(task, material, args.num_questions)
+        for label, profile in (("baseline", BASELINE), ("profile", load_profile(task))):
+            runs = [run_once(args.url, task, profile, prompt, args.num_questions) for _ in range(args.runs)]
+            print(f"{task:<18} {label:<9} {profile['model']:<28} "
+                  f"{statistics.median(r['seconds'] for r in runs):>9.2f} "
+                  f"{statistics.median(r['tokens'] for r in runs):>7.0f} "
+                  f"{statistics.median(r['tokens_per_second'] for r in runs):>7.1f} "
+                  f"{sum(r['capped'] for r in runs):>4}/{len(runs):<2} "
+                  f"{statistics.mean(r['quality'] for r in runs):>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quiz_parser import parse_questions, parse_quiz_response  # noqa: E402
+
+# Benchmark the quiz parser over a corpus of saved raw model responses.
+# Collect real responses by running the backend with QUIZ_RAW_RESPONSE_DIR set;
+# files are named <quiz_type>_<anything>.txt.
+#
+#   python benchmarks/bench_quiz_parser.py [corpus_dir] [--iterations N]
+
+QUIZ_TYPES = ['fill_in_the_blank', 'true_false', 'mcq']
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_responses')
+
+
+def load_corpus(directory):
+    corpus = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.txt'):
+            continue
+        quiz_type = next((t for t in QUIZ_TYPES if filename.startswith(f"{t}_")), None)
+        if quiz_type is None:
+            continue
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            corpus.append((filename, quiz_type, f.read()))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quiz response parser")
+    parser.add_argument('corpus_dir', nargs='?', default=os.getenv("QUIZ_RAW_RESPONSE_DIR") or DEFAULT_CORPUS)
+    parser.add_argument('--iterations', type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_dir)
+    if not corpus:
+        print(f"No <quiz_type>_*.txt responses found in {args.corpus_dir}")
+        return 1
+
+    print(f"{'response':<40} {'candidates':>10} {'valid':>6} {'rejected':>8} {'us/parse':>10}")
+    totals = {"candidates": 0, "valid": 0, "rejected": 0}
+    timings = []
+    for filename, quiz_type, response in corpus:
+        candidates = len(parse_quiz_response(response))
+        questions, rejected = parse_questions(response, quiz_type)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            parse_questions(response, quiz_type)
+        micros = (time.perf_counter() - start) / args.iterations * 1e6
+        timings.append(micros)
+        totals["candidates"] += candidates
+        totals["valid"] += len(questions)
+        totals["rejected"] += rejected
+        print(f"{filename:<40} {candidates:>10} {len(questions):>6} {rejected:>8} {micros:>10.1f}")
+
+    print(f"\n{len(corpus)} responses: {totals['valid']}/{totals['candidates']} questions kept, "
+          f"{totals['rejected']} rejected, median {statistics.median(timings):.1f} us/parse")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal stand-in for an Ollama server, for exercising the backend without a GPU or a model.
+# Serves /api/tags, /api/generate (model warm-up) and /api/chat. JSON-mode requests get a
+# well-formed quiz with the number of questions the prompt asks for; num_predict truncates output.
+#
+#   python benchmarks/fake_ollama.py --port 11435 --token-delay 0.01 --load-seconds 2
+#   OLLAMA_BASE_URLS=http://127.0.0.1:11435,http://127.0.0.1:11436 python main.py
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def fake_quiz(prompt):
+    match = re.search(r'exactly (\d+)', prompt, re.IGNORECASE)
+    count = int(match.group(1)) if match else 5
+    questions = []
+    for i in range(count):
+        if 'multiple-choice questions (MCQs)' in prompt:
+            questions.append({
+                "question": f"Which statement about topic {i + 1} is correct?",
+                "options": [f"Option {label} for topic {i + 1}" for label in 'abcd'],
+                "answer": 'abcd'[i % 4]
+            })
+        elif 'True/False questions at' in prompt:
+            questions.append({"question": f"Topic {i + 1} is covered by the material.", "answer": "True"})
+        else:
+            questions.append({"question": f"Topic {i + 1} is about _____.", "answer": f"subject {i + 1}"})
+    return json.dumps({"questions": questions})
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    token_delay = 0.0
+    load_seconds = 0.0
+    loaded_models = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _load(self, model):
+        if model not in self.loaded_models:
+            time.sleep(self.load_seconds)
+            self.loaded_models.add(model)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({"models": [{"name": "mistral:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        model = payload.get('model', '')
+        if self.path == '/api/generate':
+            self._load(model)
+            self._send_json({"model": model, "created_at": now(), "response": "", "done": True})
+        elif self.path == '/api/chat':
+            self._load(model)
+            self._stream_chat(payload)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _stream_chat(self, payload):
+        prompt = ' '.join(m.get('content', '') for m in payload.get('messages', []))
+        if payload.get('format') == 'json':
+            text = fake_quiz(prompt)
+        else:
+            text = f"This is a fake answer to a prompt of {len(prompt)} characters."
+        tokens = re.findall(r'\S+\s*', text)
+        # Honour the output cap the way Ollama does, stopping mid-output
+        num_predict = payload.get('options', {}).get('num_predict')
+        done_reason = 'length' if num_predict and len(tokens) > num_predict else 'stop'
+        tokens = tokens[:num_predict] if done_reason == 'length' else tokens
+        text = ''.join(tokens)
+        stream = payload.get('stream', True)
+        start_time = time.time()
+
+        if not stream:
+            time.sleep(self.token_delay * len(tokens))
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            for token in tokens:
+                time.sleep(self.token_delay)
+                line = {"model": payload.get('model'), "created_at": now(),
+                        "message": {"role": "assistant", "content": token}, "done": False}
+                self.wfile.write((json.dumps(line) + '\n').encode('utf-8'))
+                self.wfile.flush()
+        final = {
+            "model": payload.get('model'), "created_at": now(),
+            "message": {"role": "assistant", "content": "" if stream else text},
+            "done": True, "done_reason": done_reason,
+            "total_duration": int((time.time() - start_time) * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(tokens),
+            "eval_duration": int((time.time() - start_time) * 1e9)
+        }
+        if stream:
+            self.wfile.write((json.dumps(final) + '\n').encode('utf-8'))
+        else:
+            self._send_json(final)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--token-delay', type=float, default=0.0, help="Seconds per streamed token")
+    parser.add_argument('--load-seconds', type=float, default=0.0, help="Delay of the first call per model")
+    args = parser.parse_args()
+
+    FakeOllamaHandler.token_delay = args.token_delay
+    FakeOllamaHandler.load_seconds = args.load_seconds
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FakeOllamaHandler)
+    print(f"Fake Ollama listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
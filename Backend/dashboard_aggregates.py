@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('quiz')
+
+# Quizzes newer than this are kept as per-timestamp counters; older ones are folded into running totals
+ROLLING_WINDOW_DAYS = 7
+BUCKET_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# Journal entries after which the totals are written out as a fresh snapshot and the journal emptied
+SNAPSHOT_EVERY = 500
+
+
+# Running dashboard totals, updated as quizzes are saved and answered.
+# Only the last week is kept per quiz timestamp (second resolution, like the timestamps themselves),
+# in time order, so "last week" is cut off exactly at now - 7 days by popping expired entries off the
+# front: each quiz is rolled once, and a read does not depend on the number of quizzes.
+# Changes are appended to <path>.journal, one line each, and replayed on top of the snapshot at <path>.
+class DashboardAggregates:
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self.state = self._empty_state()
+        self._window = OrderedDict()
+        self._seq = 0
+        self._journal_entries = 0
+        self._loaded = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if "window" in state:
+                    self._window = OrderedDict((key, counters) for key, counters in state.pop("window"))
+                    self._seq = state.pop("seq", 0)
+                    self.state = state
+                    self._loaded = True
+                    self._replay()
+                else:
+                    logger.info("Dashboard aggregates use an old layout and will be rebuilt")
+            except (json.JSONDecodeError, OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not load dashboard aggregates, starting empty: {e}")
+                self.state = self._empty_state()
+                self._window = OrderedDict()
+                self._loaded = False
+
+    @staticmethod
+    def _empty_state():
+        return {
+            "total_sessions": 0,
+            "total_questions": 0,
+            "num_scored": 0,
+            "score_sum": 0.0,
+            "last_timestamp": None,
+            "current_streak": 0,
+            "study_streak": 0,
+            # Quizzes from before rolled_before (a BUCKET_FORMAT timestamp), pre-summed
+            "rolled_before": None,
+            "rolled": {"sessions": 0, "questions": 0, "score_sum": 0.0}
+        }
+
+    # Whether usable aggregates were loaded; otherwise they need a rebuild
+    def exists(self):
+        return self._loaded
+
+    # Apply the journal entries written after the snapshot
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; earlier entries are still valid
+                    logger.warning("Skipping unreadable dashboard journal entry")
+                    continue
+                self._journal_entries += 1
+                # Entries up to the snapshot's seq are already in it (a crash before the journal was emptied)
+                if entry["seq"] <= self._seq:
+                    continue
+                self._seq = entry["seq"]
+                timestamp = datetime.fromisoformat(entry["timestamp"])
+                if entry["op"] == "quiz":
+                    self._apply_quiz(timestamp, entry["summary"])
+                else:
+                    self._apply_delta(timestamp, entry["delta"])
+
+    def _snapshot(self):
+        state = dict(self.state, seq=self._seq, window=list(self._window.items()))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+
+    # Persist one change: a single appended line, with a full snapshot every snapshot_every changes
+    def _journal(self, op, timestamp, **fields):
+        self._seq += 1
+        entry = dict(fields, seq=self._seq, op=op, timestamp=timestamp.isoformat())
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        self._journal_entries += 1
+        if self._journal_entries >= self.snapshot_every:
+            self._snapshot()
+
+    # Fold counters of quizzes that are now older than the cutoff into the running totals
+    def _roll(self, now):
+        cutoff = now - timedelta(days=ROLLING_WINDOW_DAYS)
+        # Quiz timestamps are whole seconds: t < cutoff exactly when t < cutoff rounded up to a second
+        if cutoff.microsecond:
+            cutoff = cutoff.replace(microsecond=0) + timedelta(seconds=1)
+        cutoff = cutoff.strftime(BUCKET_FORMAT)
+        rolled = self.state["rolled"]
+        # The window is in time order (BUCKET_FORMAT timestamps sort chronologically as strings)
+        while self._window and next(iter(self._window)) < cutoff:
+            _, counters = self._window.popitem(last=False)
+            rolled["sessions"] += counters["sessions"]
+            rolled["questions"] += counters["questions"]
+            rolled["score_sum"] += counters["score_sum"]
+        self.state["rolled_before"] = cutoff
+
+    def _bucket(self, timestamp):
+        key = timestamp.strftime(BUCKET_FORMAT)
+        rolled_before = self.state["rolled_before"]
+        if rolled_before and key < rolled_before:
+            return None
+        counters = self._window.get(key)
+        if counters is None:
+            newest = next(reversed(self._window), None)
+            counters = self._window[key] = {"sessions": 0, "questions": 0, "score_sum": 0.0}
+            if newest is not None and key < newest:
+                # Rare: a quiz older than the newest one in the window; restore the time order
+                self._window = OrderedDict(sorted(self._window.items()))
+        return counters
+
+    def _apply_quiz(self, timestamp, summary):
+        state = self.state
+        state["total_sessions"] += 1
+        state["total_questions"] += summary["num_questions"]
+        state["num_scored"] += summary["num_scored"]
+        state["score_sum"] += summary["score_sum"]
+
+        counters = self._bucket(timestamp)
+        target = counters if counters is not None else state["rolled"]
+        target["sessions"] += 1
+        target["questions"] += summary["num_questions"]
+        target["score_sum"] += summary["score_sum"]
+
+        # Streak: consecutive quizzes exactly one day apart, as in the original full scan
+        last = state["last_timestamp"]
+        if last is None:
+            state["current_streak"] = 1
+        else:
+            last = datetime.fromisoformat(last)
+            if timestamp < last:
+                logger.warning("Quiz recorded out of order; run rebuild-dashboard to refresh the study streak")
+                return
+            state["current_streak"] = state["current_streak"] + 1 if (timestamp - last).days == 1 else 1
+        state["study_streak"] = max(state["study_streak"], state["current_streak"], 1)
+        state["last_timestamp"] = timestamp.isoformat()
+
+    def _apply_delta(self, timestamp, delta):
+        state = self.state
+        state["num_scored"] += delta["num_scored"]
+        state["score_sum"] += delta["score_sum"]
+        state["total_questions"] += delta["num_questions"]
+        counters = self._bucket(timestamp)
+        target = counters if counters is not None else state["rolled"]
+        target["score_sum"] += delta["score_sum"]
+        target["questions"] += delta["num_questions"]
+
+    # Called when a new quiz is saved
+    def record_quiz(self, timestamp, summary):
+        summary = {key: summary[key] for key in ("num_questions", "num_scored", "score_sum")}
+        with self._lock:
+            self._apply_quiz(timestamp, summary)
+            self._journal("quiz", timestamp, summary=summary)
+
+    # Called when a quiz changes (e.g. an answer is scored); applies only the difference
+    def update_quiz(self, timestamp, old_summary, new_summary):
+        delta = {key: new_summary[key] - old_summary[key] for key in ("num_questions", "num_scored", "score_sum")}
+        if not any(delta.values()):
+            return
+        with self._lock:
+            self._apply_delta(timestamp, delta)
+            self._journal("update", timestamp, delta=delta)
+
+    # Recompute everything from quiz summaries, given as (timestamp, summary) pairs
+    def rebuild(self, entries, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            self.state = self._empty_state()
+            self._window = OrderedDict()
+            self._roll(now)
+            for timestamp, summary in sorted(entries, key=lambda entry: entry[0]):
+                self._apply_quiz(timestamp, summary)
+            self._snapshot()
+            self._loaded = True
+        logger.info(f"Rebuilt dashboard aggregates from {len(entries)} quizzes")
+
+    # Current totals, with "last_week_*" covering quizzes from before the last 7 days
+    def totals(self, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            self._roll(now)
+            state = self.state
+            return {
+                "total_sessions": state["total_sessions"],
+                "total_questions": state["total_questions"],
+                "num_scored": state["num_scored"],
+                "score_sum": state["score_sum"],
+                "study_streak": state["study_streak"],
+                "last_week_sessions": state["rolled"]["sessions"],
+                "last_week_questions": state["rolled"]["questions"],
+                "last_week_score_sum": state["rolled"]["score_sum"]
+            }
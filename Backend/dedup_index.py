@@ -0,0 +1,99 @@
+import random
+import re
+import zlib
+
+# Words that carry no meaning for duplicate detection
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'to', 'in', 'on', 'for', 'and', 'or', 'is', 'are', 'was', 'were', 'be',
+    'by', 'with', 'as', 'at', 'from', 'that', 'this', 'which', 'what', 'who', 'whom', 'whose', 'how',
+    'why', 'when', 'where', 'does', 'do', 'did', 'it', 'its', 'following', 'true', 'false',
+    'during', 'about', 'into', 'between', 'there', 'their', 'these', 'those', 'can', 'will',
+    'would', 'should', 'has', 'have', 'had', 'been', 'being'
+}
+
+# Interchangeable qualifiers that paraphrases swap freely ("primary role" / "main role")
+QUALIFIERS = {
+    'main', 'primary', 'principal', 'chief', 'key', 'major', 'most', 'important', 'essential',
+    'basic', 'fundamental', 'typical', 'common', 'commonly', 'usually', 'generally', 'best'
+}
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+# Function to reduce a word to a rough singular form, so "cells" and "cell" match
+def _stem(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+# Function to turn question text into a set of shingles (content words and word pairs)
+def shingle(text):
+    words = [_stem(w) for w in re.findall(r'\w+', str(text).lower()) if w not in STOPWORDS and w not in QUALIFIERS]
+    if not words:
+        return set()
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Index of question texts that flags near-duplicates (paraphrases, reordered wording).
+# MinHash signatures are bucketed with LSH banding, so each lookup only compares against
+# the few questions sharing a band instead of every question seen so far.
+class NearDuplicateIndex:
+    def __init__(self, threshold=0.5, num_perm=32, bands=16):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # A fixed seed keeps signatures stable across processes
+        rng = random.Random(num_perm)
+        self._coefficients = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._buckets = [dict() for _ in range(bands)]
+        self._shingles = []
+
+    def __len__(self):
+        return len(self._shingles)
+
+    def _signature(self, shingles):
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._coefficients
+        ]
+
+    def _band_keys(self, signature):
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    # Returns True if text is a near-duplicate of something already in the index
+    def is_duplicate(self, text):
+        shingles = shingle(text)
+        if not shingles:
+            return False
+        candidates = set()
+        for band, key in enumerate(self._band_keys(self._signature(shingles))):
+            candidates.update(self._buckets[band].get(key, ()))
+        return any(jaccard(shingles, self._shingles[i]) >= self.threshold for i in candidates)
+
+    def add(self, text):
+        shingles = shingle(text)
+        if not shingles:
+            return
+        index = len(self._shingles)
+        self._shingles.append(shingles)
+        for band, key in enumerate(self._band_keys(self._signature(shingles))):
+            self._buckets[band].setdefault(key, []).append(index)
+
+    # Adds text unless it is a near-duplicate; returns True if it was added
+    def add_if_new(self, text):
+        if self.is_duplicate(text):
+            return False
+        self.add(text)
+        return True
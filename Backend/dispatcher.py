@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('quiz')
+
+# Sentinel pushed onto a stream queue once the producer has finished
+_STREAM_END = object()
+
+
+# Runs slow work (LLM calls, document extraction) on bounded worker pools so the
+# request threads that serve cheap routes are never all tied up at once
+class WorkDispatcher:
+    def __init__(self, pool_sizes):
+        self.pool_sizes = dict(pool_sizes)
+        self.executors = {
+            kind: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{kind}-worker")
+            for kind, size in self.pool_sizes.items()
+        }
+        self._lock = threading.Lock()
+        self._active = {kind: 0 for kind in self.pool_sizes}
+        self._pending = {kind: 0 for kind in self.pool_sizes}
+
+    def _executor(self, kind):
+        if kind not in self.executors:
+            raise ValueError(f"Unknown worker pool: {kind}")
+        return self.executors[kind]
+
+    def _track(self, kind, fn):
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self._pending[kind] -= 1
+                self._active[kind] += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active[kind] -= 1
+        return wrapper
+
+    # A queued future that is cancelled never runs its wrapper, so it leaves the queue here
+    def _forget_cancelled(self, kind, future):
+        if future.cancelled():
+            with self._lock:
+                self._pending[kind] -= 1
+
+    # Submit work to a pool and return its Future
+    def submit(self, kind, fn, *args, **kwargs):
+        executor = self._executor(kind)
+        with self._lock:
+            self._pending[kind] += 1
+        future = executor.submit(self._track(kind, fn), *args, **kwargs)
+        future.add_done_callback(lambda f: self._forget_cancelled(kind, f))
+        return future
+
+    # Run work on a pool and block the caller until it is done
+    def run(self, kind, fn, *args, timeout=None, **kwargs):
+        return self.submit(kind, fn, *args, **kwargs).result(timeout=timeout)
+
+    # Drive an iterator on a pool and yield its items to the caller as they arrive.
+    # Closing the returned generator stops the producer and closes the source iterator.
+    def stream(self, kind, iterator_factory, max_buffered=256):
+        items = queue.Queue(maxsize=max_buffered)
+        cancelled = threading.Event()
+
+        def put(item):
+            while not cancelled.is_set():
+                try:
+                    items.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            source = iterator_factory()
+            try:
+                for item in source:
+                    if not put(item):
+                        break
+            except Exception as e:
+                put(e)
+            finally:
+                if cancelled.is_set() and hasattr(source, 'close'):
+                    source.close()
+                put(_STREAM_END)
+
+        self.submit(kind, produce)
+
+        def consume():
+            try:
+                while True:
+                    item = items.get()
+                    if item is _STREAM_END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                cancelled.set()
+
+        return consume()
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {
+                    "workers": self.pool_sizes[kind],
+                    "active": self._active[kind],
+                    "queued": self._pending[kind]
+                }
+                for kind in self.pool_sizes
+            }
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
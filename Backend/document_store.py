@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('quiz')
+
+# Bump when extraction output changes so stale entries are re-extracted
+EXTRACTION_VERSION = 1
+
+
+# Function to compute the document id for uploaded file bytes
+def hash_document(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+# Persistent cache of extracted document text keyed by the SHA-256 of the upload
+class DocumentStore:
+    def __init__(self, db_path, max_documents=5000):
+        self.db_path = db_path
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    text TEXT NOT NULL,
+                    pages TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents (last_access)")
+
+    # Returns {"id", "filename", "text", "pages"} or None
+    def get(self, document_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT filename, text, pages FROM documents WHERE id = ? AND version = ?",
+                (document_id, EXTRACTION_VERSION)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE documents SET last_access = ? WHERE id = ?", (time.time(), document_id))
+        with self._lock:
+            self.counters["hits" if row else "misses"] += 1
+        if not row:
+            return None
+        return {"id": document_id, "filename": row[0], "text": row[1], "pages": json.loads(row[2])}
+
+    def get_text(self, document_id):
+        document = self.get(document_id)
+        return document["text"] if document else None
+
+    def put(self, document_id, filename, text, pages):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (id, filename, text, pages, version, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (document_id, filename, text, json.dumps(pages), EXTRACTION_VERSION, now, now)
+                )
+                # Keep the store bounded by dropping the least recently used documents
+                conn.execute(
+                    "DELETE FROM documents WHERE id IN (SELECT id FROM documents ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_documents,)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cache extracted document {document_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
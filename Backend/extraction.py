@@ -0,0 +1,64 @@
+import io
+import time
+
+import PyPDF2
+
+# PDFs longer than this are only processed up to the limit
+MAX_PDF_PAGES = 50
+
+
+# Worker for the process pool: parse the PDF bytes and extract one range of pages.
+# Returns a list of (page_index, text, seconds) tuples.
+def _extract_page_range(pdf_bytes, start, end):
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    pages = []
+    for i in range(start, end):
+        page_start = time.perf_counter()
+        text = reader.pages[i].extract_text() or ''
+        pages.append((i, text, time.perf_counter() - page_start))
+    return pages
+
+
+def _read_bytes(file):
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return file.read()
+
+
+# Function to count pages and return how many will be processed
+def count_pdf_pages(pdf_bytes, max_pages=MAX_PDF_PAGES):
+    num_pages = len(PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    return num_pages, min(num_pages, max_pages)
+
+
+# Function to extract pages one by one, yielding (page_index, text, seconds) as each page is done.
+# Each page is extracted exactly once.
+def iter_pdf_pages(file, max_pages=MAX_PDF_PAGES):
+    reader = PyPDF2.PdfReader(io.BytesIO(_read_bytes(file)))
+    for i in range(min(len(reader.pages), max_pages)):
+        page_start = time.perf_counter()
+        text = reader.pages[i].extract_text() or ''
+        yield i, text, time.perf_counter() - page_start
+
+
+# Function to extract all pages, fanning page ranges out to a process pool for large PDFs.
+# Returns (num_pages, pages) where pages is a list of (page_index, text, seconds) in page order.
+def extract_pdf_pages(file, max_pages=MAX_PDF_PAGES, process_pool=None, pool_workers=1, parallel_threshold=10):
+    pdf_bytes = _read_bytes(file)
+    num_pages, pages_to_process = count_pdf_pages(pdf_bytes, max_pages)
+
+    if process_pool is None or pool_workers < 2 or pages_to_process < parallel_threshold:
+        return num_pages, _extract_page_range(pdf_bytes, 0, pages_to_process)
+
+    # One contiguous range per worker keeps the per-process PDF parse overhead low
+    range_size = -(-pages_to_process // pool_workers)
+    futures = [
+        process_pool.submit(_extract_page_range, pdf_bytes, start, min(start + range_size, pages_to_process))
+        for start in range(0, pages_to_process, range_size)
+    ]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return num_pages, pages
@@ -0,0 +1,153 @@
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger('quiz')
+
+
+# Persistent job queue backed by a local SQLite file.
+# Jobs survive a restart: anything left "running" is put back on the queue at startup.
+class JobQueue:
+    def __init__(self, db_path, handler, num_workers=2, poll_interval=1.0):
+        self.db_path = db_path
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+            recovered = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (datetime.now().isoformat(),)
+            ).rowcount
+        if recovered:
+            logger.warning(f"Re-queued {recovered} jobs interrupted by a restart")
+
+    def start(self):
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._wakeup.set()
+        logger.info(f"Job queue started with {self.num_workers} workers")
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    # Add a job and return its id
+    def enqueue(self, kind, params, total=None):
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, total, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), total, now, now)
+            )
+        self._wakeup.set()
+        logger.info(f"Enqueued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def position(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < "
+                "(SELECT created_at FROM jobs WHERE id = ?)",
+                (job_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def update_progress(self, job_id, progress):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (progress, datetime.now().isoformat(), job_id)
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, datetime.now().isoformat(), job_id)
+            )
+
+    # Atomically move the oldest queued job to "running".
+    # The status check in the UPDATE keeps two processes sharing the file from claiming the same job.
+    def _claim_next(self):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (datetime.now().isoformat(), row['id'])
+            ).rowcount
+            if not claimed:
+                return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            job = self._claim_next()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            job_id = job['id']
+            logger.info(f"Running {job['kind']} job {job_id}")
+            try:
+                result = self.handler(job['kind'], job['params'], lambda progress: self.update_progress(job_id, progress))
+                self._finish(job_id, 'completed', result=result)
+                logger.info(f"Completed {job['kind']} job {job_id}")
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+                self._finish(job_id, 'failed', error=str(e))
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
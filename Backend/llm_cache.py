@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger('quiz')
+
+
+# Function to build a content-addressed key for a pipeline call
+def make_cache_key(pipeline_name, fingerprint, inputs):
+    payload = json.dumps(
+        {"pipeline": pipeline_name, "fingerprint": fingerprint, "inputs": inputs},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Two-tier cache for LLM responses: an in-memory LRU in front of a SQLite file.
+# Entries expire after ttl_seconds; the disk tier is trimmed by least-recent access
+# once it grows past max_disk_bytes.
+class ResponseCache:
+    def __init__(self, db_path, max_memory_entries=256, max_disk_bytes=200 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    pipeline TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            elif row:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key, value, pipeline_name=''):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self.counters["stores"] += 1
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, pipeline, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, pipeline_name, value, size, expires_at, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write LLM cache entry: {e}")
+
+    # Drop expired rows, then the least recently used ones until the disk tier fits its budget
+    def _evict(self, conn):
+        evicted = conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_disk_bytes:
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+                if total <= self.max_disk_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        if evicted:
+            with self._lock:
+                self.counters["evictions"] += evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0
+        return stats
@@ -0,0 +1,49 @@
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+# Shortens long log messages (request payloads, raw LLM responses) before they are queued
+class TruncatingFilter(logging.Filter):
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        if self.max_chars > 0:
+            message = record.getMessage()
+            if len(message) > self.max_chars:
+                record.msg = f"{message[:self.max_chars]}... [truncated {len(message) - self.max_chars} chars]"
+                record.args = None
+        return True
+
+
+# Function to configure a logger that hands records to a background thread through a queue.
+# The file handler rotates by size (max_bytes) or, when rotate_when is set, by time.
+def setup_logger(name, filepath, level='INFO', max_bytes=10 * 1024 * 1024, backup_count=5,
+                 rotate_when=None, max_message_chars=2000, to_stdout=True):
+    if rotate_when:
+        file_handler = TimedRotatingFileHandler(filepath, when=rotate_when, backupCount=backup_count, encoding='utf-8')
+    else:
+        file_handler = RotatingFileHandler(filepath, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [file_handler]
+    if to_stdout:
+        handlers.append(logging.StreamHandler(sys.stdout))
+
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(TruncatingFilter(max_message_chars))
+
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger
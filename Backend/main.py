@@ -1,25 +1,49 @@
-from flask import Flask, request, jsonify
-from langchain_ollama import ChatOllama
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-import logging
 from bson.objectid import ObjectId
 import os
 from datetime import datetime
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import sys
 import re
 import json
+import io
 from docx import Document
-import PyPDF2
 import time
 import random
-from difflib import SequenceMatcher
 from datetime import datetime, timedelta
 from flask_pymongo import PyMongo
 from dotenv import load_dotenv
 import bcrypt
+from pymongo.errors import DuplicateKeyError, PyMongoError
 import jwt
+import click
+import threading
+import multiprocessing
+import importlib.machinery
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dispatcher import WorkDispatcher
+from job_queue import JobQueue
+from llm_cache import ResponseCache, make_cache_key
+from extraction import MAX_PDF_PAGES, extract_pdf_pages, iter_pdf_pages
+from document_store import DocumentStore, hash_document
+from quiz_ids import new_quiz_id
+from quiz_store import CachedQuizStore, FileQuizStore, KeyedLocks, create_quiz_store, import_json_quizzes, summarize_quiz
+from answer_log import AnswerLog
+from activity_feed import ActivityFeed
+from dashboard_aggregates import DashboardAggregates
+from log_config import setup_logger
+from quiz_parser import check_count, parse_questions
+from dedup_index import NearDuplicateIndex
+import prompts
+from model_profiles import load_profiles, output_cap
+from ollama_clients import OllamaClientManager
+from auth_cache import TTLCache
+from admission import AdmissionController, AdmissionLane, Overloaded, RateLimiter
+from metrics import REGISTRY, Counter, Gauge, Histogram
+from tracing import Trace, TraceExporter, bind, current_span, detach, request_id_from, span, start_trace, traced
 
 # Ensure UTF-8 encoding for stdout and stderr
 sys.stdout.reconfigure(encoding='utf-8')
@@ -28,30 +52,38 @@ sys.stderr.reconfigure(encoding='utf-8')
 # Directory to save logs and quizzes
 LOG_STORAGE_DIR = os.path.join(os.getcwd(), 'logs')
 QUIZ_STORAGE_DIR = os.path.join(os.getcwd(), 'generated_quizzes')
-for directory in [LOG_STORAGE_DIR, QUIZ_STORAGE_DIR]:
+DATA_STORAGE_DIR = os.path.join(os.getcwd(), 'data')
+for directory in [LOG_STORAGE_DIR, QUIZ_STORAGE_DIR, DATA_STORAGE_DIR]:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
+# Load environment variables
+load_dotenv()
+
 # Setup logging for chat and quiz activities
-chat_logger = logging.getLogger('chat')
-chat_logger.setLevel(logging.INFO)
-chat_handler = logging.FileHandler(os.path.join(LOG_STORAGE_DIR, 'chat_logs.log'), encoding='utf-8')
-chat_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-chat_logger.addHandler(chat_handler)
-chat_logger.addHandler(logging.StreamHandler(sys.stdout))
-
-quiz_logger = logging.getLogger('quiz')
-quiz_logger.setLevel(logging.INFO)
-quiz_handler = logging.FileHandler(os.path.join(LOG_STORAGE_DIR, 'quiz_logs.log'), encoding='utf-8')
-quiz_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-quiz_logger.addHandler(quiz_handler)
-quiz_logger.addHandler(logging.StreamHandler(sys.stdout))
+# Records go through a queue to a background thread; files rotate and long messages are truncated
+log_options = {
+    "max_bytes": int(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024,
+    "backup_count": int(os.getenv("LOG_BACKUP_COUNT", "5")),
+    "rotate_when": os.getenv("LOG_ROTATE_WHEN") or None,
+    "max_message_chars": int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000")),
+    "to_stdout": os.getenv("LOG_TO_STDOUT", "true").lower() == "true"
+}
+chat_logger = setup_logger('chat', os.path.join(LOG_STORAGE_DIR, 'chat_logs.log'), level=os.getenv("CHAT_LOG_LEVEL", "INFO"), **log_options)
+quiz_logger = setup_logger('quiz', os.path.join(LOG_STORAGE_DIR, 'quiz_logs.log'), level=os.getenv("QUIZ_LOG_LEVEL", "INFO"), **log_options)
 
 chat_logger.info("Starting Flask app and initializing chat logger")
 quiz_logger.info("Starting Flask app and initializing quiz logger")
 
 # Initialize Flask app
-app = Flask(_name_)
+app = Flask(__name__)
+
+# Behind TRUSTED_PROXY_COUNT reverse proxies, take the client address from X-Forwarded-For
+# so per-IP rate limits see real clients; leave at 0 when clients connect directly,
+# otherwise anyone could pick their own address
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT, x_host=TRUSTED_PROXY_COUNT)
 
 # Enable CORS for frontend
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3003", "http://localhost:3000"]}})
@@ -59,8 +91,6 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:3003", "http://localh
 # Set maximum upload size to 50MB
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB limit
 
-# Load environment variables
-load_dotenv()
 app.config["MONGO_URI"] = os.getenv("MONGO_URI")
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
 
@@ -85,110 +115,416 @@ except Exception as e:
     quiz_logger.error(f"Failed to connect to MongoDB: {e}")
     exit(1)
 
+# Keep login and user lookups index-backed; a unique email index also stops duplicate registrations
+def ensure_user_indexes():
+    try:
+        mongo.db.users.create_index('email', unique=True, name='email_unique')
+        quiz_logger.info("User indexes are in place")
+    except PyMongoError as e:
+        quiz_logger.error(f"Could not create the unique index on users.email (duplicate emails?): {e}")
+
+with app.app_context():
+    ensure_user_indexes()
+
+# Fields returned by user lookups; the password hash is only read where it is checked
+USER_PROFILE_PROJECTION = {"name": 1, "email": 1}
+
+# Verified tokens and user profiles are cached for AUTH_CACHE_TTL_SECONDS so authenticated
+# routes skip JWT decoding and the users query; profile changes invalidate the entries
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+token_cache = TTLCache(max_entries=10000, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+user_profile_cache = TTLCache(max_entries=10000, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+# Bounded worker pools for LLM calls, document extraction and password hashing
+dispatcher = WorkDispatcher({
+    "llm": int(os.getenv("LLM_WORKERS", "2")),
+    "extraction": int(os.getenv("EXTRACTION_WORKERS", "2")),
+    "password": int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+})
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded (or downgraded) on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Documents longer than SUMMARY_CHUNK_CHARS are summarized chunk by chunk before the final summary
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "4000"))
+
+# Extracted text of uploaded documents, keyed by the hash of the file bytes
+document_store = DocumentStore(
+    os.path.join(DATA_STORAGE_DIR, 'documents.sqlite3'),
+    max_documents=int(os.getenv("DOCUMENT_CACHE_MAX_DOCUMENTS", "5000"))
+)
+
+# PDFs with at least PDF_PARALLEL_THRESHOLD pages are split across PDF_PROCESS_WORKERS processes
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", "0"))
+PDF_PARALLEL_THRESHOLD = int(os.getenv("PDF_PARALLEL_THRESHOLD", "10"))
+pdf_process_pool = None
+pdf_process_pool_lock = threading.Lock()
+
+# Function to get the PDF process pool, created on first use (None when PDF_PROCESS_WORKERS < 2).
+# Workers are spawned, not forked: forking a process that already runs threads (server, worker pools,
+# log listener) can copy a lock held by another thread into the child, which then deadlocks on it
+def get_pdf_process_pool():
+    global pdf_process_pool
+    if PDF_PROCESS_WORKERS < 2:
+        return None
+    with pdf_process_pool_lock:
+        if pdf_process_pool is None:
+            pdf_process_pool = ProcessPoolExecutor(max_workers=PDF_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return pdf_process_pool
+
+# Directory to collect raw quiz responses into (unset to disable)
+QUIZ_RAW_RESPONSE_DIR = os.getenv("QUIZ_RAW_RESPONSE_DIR")
+if QUIZ_RAW_RESPONSE_DIR:
+    os.makedirs(QUIZ_RAW_RESPONSE_DIR, exist_ok=True)
+
+# Large quizzes are generated in batches of QUIZ_BATCH_SIZE questions,
+# with at most QUIZ_PARALLEL_BATCHES batches in flight per request
+QUIZ_BATCH_SIZE = int(os.getenv("QUIZ_BATCH_SIZE", "5"))
+QUIZ_PARALLEL_BATCHES = int(os.getenv("QUIZ_PARALLEL_BATCHES", os.getenv("LLM_WORKERS", "2")))
+
+# Questions whose word overlap with an earlier one reaches QUIZ_DEDUP_THRESHOLD are dropped as paraphrases.
+# With "avoid_repeats": true, questions from the user's last QUIZ_DEDUP_HISTORY quizzes are excluded too.
+QUIZ_DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", "0.5"))
+QUIZ_DEDUP_HISTORY = int(os.getenv("QUIZ_DEDUP_HISTORY", "20"))
+
+# Each quiz may spend at most QUIZ_TOPUP_CALLS model calls beyond its planned batches to make up
+# for short or failed batches; a call that takes longer than QUIZ_CALL_TIMEOUT_SECONDS is abandoned
+QUIZ_TOPUP_CALLS = int(os.getenv("QUIZ_TOPUP_CALLS", "3"))
+QUIZ_CALL_TIMEOUT_SECONDS = float(os.getenv("QUIZ_CALL_TIMEOUT_SECONDS", "180"))
+QUIZ_MAX_EXCLUSIONS = 10
+
+# Raised when no questions could be generated; the quiz is not saved and the route answers 503
+class QuizGenerationError(RuntimeError):
+    pass
+
+# Running totals of what quiz generation cost, reported by /health
+generation_totals = {"quizzes": 0, "calls": 0, "cache_hits": 0, "topups": 0, "timeouts": 0, "failed_calls": 0}
+generation_totals_lock = threading.Lock()
+
+# Cache of LLM responses keyed on pipeline configuration and inputs
+llm_cache = ResponseCache(
+    os.path.join(DATA_STORAGE_DIR, 'llm_cache.sqlite3'),
+    max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+    max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024,
+    ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+) if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true" else None
+
+# Ollama servers used for inference; calls go to the least-loaded healthy one.
+# Models are loaded at startup and kept in memory for OLLAMA_KEEP_ALIVE between calls.
+# A server that sends nothing for OLLAMA_REQUEST_TIMEOUT_SECONDS fails the call and frees its worker
+# (by default the quiz call timeout, so an abandoned quiz call never outlives its deadline by much).
+OLLAMA_REQUEST_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_REQUEST_TIMEOUT_SECONDS", str(QUIZ_CALL_TIMEOUT_SECONDS)))
+ollama_clients = OllamaClientManager(
+    [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "http://127.0.0.1:11434").split(',') if url.strip()],
+    keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+    probe_interval=int(os.getenv("OLLAMA_PROBE_INTERVAL", "30")),
+    pool_connections=int(os.getenv("OLLAMA_POOL_CONNECTIONS", "8")),
+    request_timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS
+)
+
+# Admission control for the model-backed routes. Each kind of request gets a number of concurrent
+# slots (by default enough to keep every Ollama server's workers busy) and a bounded wait queue;
+# clients are also rate limited per user (per IP address when not logged in).
+# A full queue, a wait longer than ADMISSION_QUEUE_TIMEOUT or a rate limit answers 429 with Retry-After.
+LLM_CAPACITY = int(os.getenv("LLM_WORKERS", "2")) * len(ollama_clients.endpoints)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+admission = AdmissionController(
+    [
+        AdmissionLane("chat", int(os.getenv("ADMISSION_CHAT_CONCURRENCY", str(LLM_CAPACITY))),
+                      int(os.getenv("ADMISSION_CHAT_QUEUE", "6")), ADMISSION_QUEUE_TIMEOUT),
+        # A quiz keeps up to QUIZ_PARALLEL_BATCHES calls in flight, so fewer quizzes fit at once
+        AdmissionLane("quiz", int(os.getenv("ADMISSION_QUIZ_CONCURRENCY", str(max(1, LLM_CAPACITY // QUIZ_PARALLEL_BATCHES)))),
+                      int(os.getenv("ADMISSION_QUIZ_QUEUE", "3")), ADMISSION_QUEUE_TIMEOUT)
+    ],
+    RateLimiter({
+        "chat": (int(os.getenv("CHAT_RATE_PER_MINUTE", "20")), int(os.getenv("CHAT_RATE_BURST", "5"))),
+        "quiz": (int(os.getenv("QUIZ_RATE_PER_MINUTE", "6")), int(os.getenv("QUIZ_RATE_BURST", "3")))
+    })
+)
+# Admitted and queued requests each hold one of the SERVER_THREADS server threads; keep
+# ADMISSION_RESERVED_THREADS of them free for /health, /metrics, login and the other cheap routes
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+ADMISSION_RESERVED_THREADS = int(os.getenv("ADMISSION_RESERVED_THREADS", "4"))
+if admission.limit_threads(max(SERVER_THREADS - ADMISSION_RESERVED_THREADS, len(admission.lanes))):
+    quiz_logger.warning(
+        f"Admission slots and queues did not fit in {SERVER_THREADS} server threads with "
+        f"{ADMISSION_RESERVED_THREADS} reserved; reduced them to " + ', '.join(
+            f"{name}: {lane.max_concurrent} concurrent + {lane.max_queue} queued" for name, lane in admission.lanes.items())
+    )
+# Async quiz jobs wait in the job queue instead; it is capped at JOB_QUEUE_MAX queued jobs
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+
+# Prometheus metrics served by /metrics (token counts and endpoint failovers live in ollama_clients.py)
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency per Flask route', ['route', 'method', 'status'])
+LLM_CALLS = Counter('llm_calls_total', 'Model calls per pipeline', ['pipeline', 'status'])
+LLM_CALL_SECONDS = Histogram('llm_call_duration_seconds', 'Model call duration per pipeline', ['pipeline'])
+LLM_FIRST_TOKEN_SECONDS = Histogram('llm_time_to_first_token_seconds', 'Time to first streamed token', ['pipeline'])
+LLM_CACHE_HITS = Counter('llm_cache_hits_total', 'Pipeline calls answered from the response cache', ['pipeline'])
+QUIZ_RETRIES = Counter('quiz_topup_calls_total', 'Extra model calls made to make up for short or failed quiz batches', ['quiz_type'])
+QUIZ_CALL_TIMEOUTS = Counter('quiz_call_timeouts_total', 'Quiz model calls abandoned after QUIZ_CALL_TIMEOUT_SECONDS', ['quiz_type'])
+QUIZ_GENERATION_SECONDS = Histogram('quiz_generation_duration_seconds', 'Time to generate a whole quiz', ['quiz_type'])
+QUIZ_PARSE_REJECTED = Counter('quiz_parse_rejected_questions_total', 'Malformed questions dropped by the quiz parser', ['quiz_type'])
+QUIZ_PARSE_FAILURES = Counter('quiz_parse_failures_total', 'Quiz responses that yielded no usable questions', ['quiz_type'])
+EXTRACTION_PAGES = Counter('extraction_pages_total', 'PDF pages extracted', ['mode'])
+EXTRACTION_PAGES_PER_SECOND = Histogram('extraction_pages_per_second', 'PDF extraction throughput per document', ['mode'],
+                                        buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+Gauge('worker_pool_tasks', 'Running and queued tasks per worker pool', ['pool', 'state'],
+      collect=lambda: {(pool, state): s[state] for pool, s in dispatcher.stats().items() for state in ('active', 'queued')})
+Gauge('admission_requests', 'Admitted and waiting requests per admission lane', ['lane', 'state'],
+      collect=lambda: {(lane, state): s[state] for lane, s in admission.stats().items() for state in ('active', 'waiting')})
+Gauge('ollama_endpoint_in_flight', 'Calls in flight per Ollama endpoint', ['endpoint'],
+      collect=lambda: {(e['url'],): e['in_flight'] for e in ollama_clients.stats()})
+Gauge('ollama_endpoint_healthy', 'Whether the last probe of an Ollama endpoint succeeded', ['endpoint'],
+      collect=lambda: {(e['url'],): int(e['healthy']) for e in ollama_clients.stats()})
+Gauge('quiz_jobs', 'Quiz jobs per status', ['status'],
+      collect=lambda: {(status,): count for status, count in job_queue.stats().items()})
+
+# Every request is traced as nested timed spans under an X-Request-ID (the caller's, or a new one).
+# A TRACE_SAMPLE_RATE share of traces, plus any slower than TRACE_SLOW_SECONDS, are appended to
+# data/traces.jsonl; TRACE_SERVER_TIMING=true adds the span breakdown as a Server-Timing header.
+trace_exporter = TraceExporter(
+    os.path.join(DATA_STORAGE_DIR, 'traces.jsonl'),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+    slow_seconds=float(os.getenv("TRACE_SLOW_SECONDS", "0")),
+    max_bytes=int(os.getenv("TRACE_MAX_MB", "50")) * 1024 * 1024
+)
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "false").lower() == "true"
+
+@app.before_request
+def start_request_trace():
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace = start_trace(Trace(f"{request.method} {route}", request_id_from(request.headers.get('X-Request-ID')),
+                                trace_exporter.should_sample()))
+
+@app.after_request
+def finish_request_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    response.headers['X-Request-ID'] = trace.request_id
+
+    def finish():
+        trace.finish(status=response.status_code)
+        try:
+            trace_exporter.export(trace)
+        except OSError as e:
+            quiz_logger.error(f"Failed to export trace {trace.request_id}: {e}")
+
+    if response.is_streamed:
+        response.call_on_close(finish)
+    else:
+        finish()
+        if TRACE_SERVER_TIMING:
+            response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+@app.teardown_request
+def detach_request_trace(error=None):
+    detach()
+
+# Time every request; streamed responses are timed until the last chunk has been sent
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
+
+@app.after_request
+def record_request_latency(response):
+    start_time = g.get('request_start')
+    if start_time is None:
+        return response
+    labels = {
+        "route": request.url_rule.rule if request.url_rule else "unmatched",
+        "method": request.method,
+        "status": response.status_code
+    }
+    observe = lambda: HTTP_REQUEST_SECONDS.observe(time.time() - start_time, **labels)
+    if response.is_streamed:
+        response.call_on_close(observe)
+    else:
+        observe()
+    return response
+
+# Model, context size, output cap and temperature for each pipeline (see model_profiles.py)
+model_profiles = load_profiles()
+
 # Global variables for pipelines
 chat_pipeline = None
 summarize_pipeline = None
+summarize_chunk_pipeline = None
 mcq_pipeline = None
 true_false_pipeline = None
 fill_in_the_blank_pipeline = None
 
-# Initialize the model (mistral:7b)
+# Initialize the pipelines
 def initialise_model():
-    global chat_pipeline, summarize_pipeline, mcq_pipeline, true_false_pipeline, fill_in_the_blank_pipeline
+    global chat_pipeline, summarize_pipeline, summarize_chunk_pipeline, mcq_pipeline, true_false_pipeline, fill_in_the_blank_pipeline
     try:
-        # Chat prompt
-        chat_prompt = PromptTemplate.from_template(
-            "You are EduMind Chatbot, an AI assistant designed to help students learn and explore knowledge. "
-            "Answer the following question in a clear and concise manner: {question}"
-        )
+        # Prompt templates live in prompts.py
+        chat_prompt = PromptTemplate.from_template(prompts.CHAT_PROMPT)
+        summarize_prompt = PromptTemplate.from_template(prompts.SUMMARIZE_PROMPT)
+        summarize_chunk_prompt = PromptTemplate.from_template(prompts.SUMMARIZE_CHUNK_PROMPT)
+        mcq_prompt = PromptTemplate.from_template(prompts.MCQ_PROMPT)
+        true_false_prompt = PromptTemplate.from_template(prompts.TRUE_FALSE_PROMPT)
+        fill_in_the_blank_prompt = PromptTemplate.from_template(prompts.FILL_IN_THE_BLANK_PROMPT)
+
+        # One model per task, configured from its profile; quiz models run in JSON mode
+        def task_model(task, **extra):
+            options = {key: value for key, value in model_profiles[task].items() if value is not None}
+            return ollama_clients.chat_model(task=task, **options, **extra)
 
-        # Summarization prompt
-        summarize_prompt = PromptTemplate.from_template(
-            "You are EduMind Chatbot. Provide a detailed summary of the following text in exactly 2 paragraphs, totaling 300-400 words. "
-            "Focus on the main ideas, key details, and overall context, omitting minor details. Use natural paragraph breaks and ensure the summary is comprehensive. "
-            "Output only the summary with no additional text or explanations. Text to summarize: {text}"
-        )
-
-        # Updated MCQ Prompt to enforce strict single-answer format
-        mcq_prompt = PromptTemplate.from_template(
-            "Generate EXACTLY {num_questions} multiple-choice questions (MCQs) at {difficulty} difficulty level based on the following material: {material}. "
-            "Each MCQ MUST have EXACTLY one correct answer among four distinct options labeled a), b), c), and d). "
-            "You MUST generate ONLY multiple-choice questions with four options and a single correct answer. "
-            "Do NOT generate True/False, Fill-in-the-Blank, or questions with multiple correct answers. "
-            "The answer MUST be a single letter: a, b, c, or d, with no additional text or description. "
-            "If you cannot generate exactly {num_questions} valid MCQs, output 'Error: Unable to generate exact number of valid MCQs' and stop. "
-            "Each MCQ must be unique, cover different aspects of the material, and avoid repetition. "
-            "Format each MCQ strictly as:\n"
-            "<number>. <question>\n"
-            "a) <option1>\n"
-            "b) <option2>\n"
-            "c) <option3>\n"
-            "d) <option4>\n"
-            "Answer: <a, b, c, or d>\n"
-            "Return only the formatted questions, with no additional text or comments."
-        )
-
-        # True/False Prompt
-        true_false_prompt = PromptTemplate.from_template(
-            "Generate exactly {num_questions} True/False questions at {difficulty} difficulty level based on the following material: {material}. "
-            "You MUST generate EXACTLY {num_questions} questions, numbered from 1 to {num_questions}, with no fewer and no more. "
-            "ONLY generate True/False questions. Do NOT generate multiple-choice, fill-in-the-blank, or any other question types under any circumstances. "
-            "Each question must be a statement with a True or False answer (e.g., 'Answer: True'). "
-            "Ensure questions are diverse, cover different aspects of the material, and do not repeat or focus on the same topic excessively. "
-            "If you cannot generate the exact number, output 'Error: Unable to generate exact number of questions' instead. "
-            "Format each question as:\n"
-            "<number>. <statement>\n"
-            "Answer: <True or False>\n"
-            "Return only the questions in the specified format, with no additional text."
-        )
-
-        # Fill-in-the-Blank Prompt
-        fill_in_the_blank_prompt = PromptTemplate.from_template(
-            "Generate exactly {num_questions} Fill-in-the-Blank questions at {difficulty} difficulty level based on the following material: {material}. "
-            "You MUST generate EXACTLY {num_questions} questions, numbered from 1 to {num_questions}, with no fewer and no more. "
-            "ONLY generate Fill-in-the-Blank questions. Do NOT generate multiple-choice, true/false, or any other question types under any circumstances. "
-            "Each question must be a sentence with a blank (_) and an answer that fits the blank (e.g., 'Answer: word'). "
-            "Ensure questions are diverse, cover different aspects of the material, and do not repeat or focus on the same topic excessively. "
-            "If you cannot generate the exact number, output 'Error: Unable to generate exact number of questions' instead. "
-            "Format each question as:\n"
-            "<number>. <sentence with a blank> _____\n"
-            "Answer: <correct word/phrase>\n"
-            "Return only the questions in the specified format, with no additional text."
-        )
-
-        # Initialize the ChatOllama model with increased context
-        model = ChatOllama(
-            model="mistral:latest",
-            base_url="http://127.0.0.1:11434",
-            num_ctx=2048,
-            temperature=0.7
-        )
         output_parser = StrOutputParser()
 
         # Create pipelines
-        chat_pipeline = chat_prompt | model | output_parser
-        summarize_pipeline = summarize_prompt | model | output_parser
-        mcq_pipeline = mcq_prompt | model | output_parser
-        true_false_pipeline = true_false_prompt | model | output_parser
-        fill_in_the_blank_pipeline = fill_in_the_blank_prompt | model | output_parser
-
-        chat_logger.info("Successfully initialized ChatOllama model with mistral:7b")
-        quiz_logger.info("Successfully initialized quiz and summarize pipelines with mistral:7b")
+        chat_pipeline = chat_prompt | task_model("chat") | output_parser
+        summarize_pipeline = summarize_prompt | task_model("summarize") | output_parser
+        summarize_chunk_pipeline = summarize_chunk_prompt | task_model("summarize_chunk") | output_parser
+        mcq_pipeline = mcq_prompt | task_model("mcq", format="json") | output_parser
+        true_false_pipeline = true_false_prompt | task_model("true_false", format="json") | output_parser
+        fill_in_the_blank_pipeline = fill_in_the_blank_prompt | task_model("fill_in_the_blank", format="json") | output_parser
+
+        for task, profile in model_profiles.items():
+            task_logger = chat_logger if task in ("chat", "summarize", "summarize_chunk") else quiz_logger
+            task_logger.info(f"Initialized {task} pipeline with {profile['model']} (num_ctx={profile['num_ctx']}, "
+                        f"num_predict={profile['num_predict']}, temperature={profile['temperature']})")
     except Exception as e:
-        chat_logger.error(f"Failed to initialize mistral:7b: {str(e)}", exc_info=True)
-        quiz_logger.error(f"Failed to initialize mistral:7b: {str(e)}", exc_info=True)
+        chat_logger.error(f"Failed to initialize pipelines: {str(e)}", exc_info=True)
+        quiz_logger.error(f"Failed to initialize pipelines: {str(e)}", exc_info=True)
         chat_pipeline = None
         summarize_pipeline = None
+        summarize_chunk_pipeline = None
         mcq_pipeline = None
         true_false_pipeline = None
         fill_in_the_blank_pipeline = None
 
-# Initialize the model on startup
+# Initialize the model on startup, then probe the Ollama servers and warm the model up in the background
 initialise_model()
-
-# Function to check similarity between two strings
-def similarity(a, b):
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+ollama_clients.start(warm_up=os.getenv("OLLAMA_WARMUP", "true").lower() == "true")
+
+# Function to describe everything about a pipeline that affects its output
+def pipeline_fingerprint(pipeline):
+    prompt, model = pipeline.steps[0], pipeline.steps[1]
+    return {
+        "template": prompt.template,
+        "model": model.model,
+        "num_ctx": model.num_ctx,
+        "temperature": model.temperature,
+        "num_predict": model.num_predict,
+        "format": model.format
+    }
+
+# Function to give a quiz pipeline an output cap sized for num_questions questions
+def with_output_cap(pipeline, quiz_type, num_questions):
+    prompt, model, parser = pipeline.steps
+    cap = output_cap(quiz_type, num_questions)
+    if model.num_predict:
+        cap = min(cap, model.num_predict)
+    return prompt | model.with_options(num_predict=cap) | parser
+
+# Function to build the response cache key for a pipeline call, or None when caching is off
+def pipeline_cache_key(pipeline, name, inputs, use_cache=True):
+    if not use_cache or llm_cache is None:
+        return None
+    return make_cache_key(name, pipeline_fingerprint(pipeline), inputs)
+
+# Function to queue a pipeline call on the LLM worker pool and return a Future
+# Pass use_cache=False when a fresh sample is needed (e.g. retries after a short quiz);
+# span_attrs are added to the call's trace span. cache_if(response) decides whether a response may be
+# cached (e.g. only quiz output that parses); cached entries it rejects are treated as misses
+def submit_pipeline(pipeline, inputs, name, use_cache=True, span_attrs=None, cache_if=None):
+    span_attrs = span_attrs or {}
+    cache_key = pipeline_cache_key(pipeline, name, inputs, use_cache)
+    if cache_key:
+        cached = llm_cache.get(cache_key)
+        if cached is not None and (cache_if is None or cache_if(cached)):
+            quiz_logger.info(f"LLM cache hit for {name} pipeline")
+            LLM_CACHE_HITS.inc(pipeline=name)
+            with span(f"llm.{name}", cached=True, **span_attrs):
+                pass
+            future = Future()
+            future.set_result(cached)
+            future.cached = True
+            return future
+
+    submitted_at = time.time()
+
+    # The prompt, model and output parser run as separate steps so each gets its own span
+    def call():
+        start_time = time.time()
+        prompt, model, parser = pipeline.steps
+        try:
+            with span(f"llm.{name}", queued_ms=round((start_time - submitted_at) * 1000, 1), **span_attrs):
+                with span("render_prompt"):
+                    prompt_value = prompt.invoke(inputs)
+                with span("model", model=model.model):
+                    message = model.invoke(prompt_value)
+                with span("output_parser"):
+                    response = parser.invoke(message)
+        except Exception:
+            LLM_CALLS.inc(pipeline=name, status='error')
+            raise
+        finally:
+            LLM_CALL_SECONDS.observe(time.time() - start_time, pipeline=name)
+        LLM_CALLS.inc(pipeline=name, status='ok')
+        if cache_key and response and (cache_if is None or cache_if(response)):
+            llm_cache.set(cache_key, response, name)
+        return response
+
+    return dispatcher.submit("llm", bind(call))
+
+# Function to run a pipeline on the LLM worker pool and wait for the response
+def invoke_pipeline(pipeline, inputs, name, use_cache=True):
+    return submit_pipeline(pipeline, inputs, name, use_cache).result()
+
+# Function to split text into chunks of at most max_chars along paragraph boundaries
+# Paragraphs longer than max_chars are split on sentences, then hard-wrapped as a last resort
+def chunk_text(text, max_chars):
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n|\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Function to reduce a long document to text that fits the summarize prompt.
+# Chunks are summarized in parallel (map) and the joined summaries are reduced again
+# until they fit; chunk summaries are cached, so an edited document only re-runs changed chunks.
+def prepare_summary_input(text, use_cache=True):
+    level = 0
+    while len(text) > SUMMARY_CHUNK_CHARS:
+        level += 1
+        chunks = chunk_text(text, SUMMARY_CHUNK_CHARS)
+        chat_logger.info(f"Summarizing {len(chunks)} chunks (level {level}) from {len(text)} characters")
+        start_time = time.time()
+        futures = [submit_pipeline(summarize_chunk_pipeline, {"text": chunk}, "summarize_chunk", use_cache) for chunk in chunks]
+        summaries = [future.result().strip() for future in futures]
+        chat_logger.info(f"Level {level} chunk summaries took {time.time() - start_time:.2f} seconds")
+        reduced = '\n\n'.join(summary for summary in summaries if summary)
+        if len(reduced) >= len(text):
+            # The model did not shrink the text; truncate rather than loop forever
+            chat_logger.warning("Chunk summaries did not reduce the text, truncating for the final summary")
+            return reduced[:SUMMARY_CHUNK_CHARS]
+        text = reduced
+    return text
 
 # Function to extract text from a Word document (.docx)
 def extract_text_from_docx(file):
@@ -200,193 +536,154 @@ def extract_text_from_docx(file):
         quiz_logger.error(f"Error extracting text from Word document: {e}")
         raise
 
+# Function to log per-page extraction timing and return page metadata
+def summarize_page_timings(pages):
+    page_info = []
+    for index, text, seconds in pages:
+        quiz_logger.debug(f"Page {index + 1}: {len(text)} characters in {seconds:.3f} seconds")
+        page_info.append({"page": index + 1, "characters": len(text), "seconds": round(seconds, 4)})
+    if page_info:
+        slowest = max(page_info, key=lambda p: p["seconds"])
+        quiz_logger.info(f"Slowest page: {slowest['page']} ({slowest['seconds']:.3f} seconds)")
+    return page_info
+
+# Function to record extraction throughput for /metrics
+def record_extraction(page_count, seconds, mode):
+    EXTRACTION_PAGES.inc(page_count, mode=mode)
+    if page_count and seconds > 0:
+        EXTRACTION_PAGES_PER_SECOND.observe(page_count / seconds, mode=mode)
+
 # Function to extract text from a PDF file
+# Returns (extracted_text, page_info) where page_info holds per-page sizes and timings
 def extract_text_from_pdf(file):
     try:
         start_time = time.time()
-        reader = PyPDF2.PdfReader(file)
-        num_pages = len(reader.pages)
+        num_pages, pages = extract_pdf_pages(
+            file,
+            max_pages=MAX_PDF_PAGES,
+            process_pool=get_pdf_process_pool(),
+            pool_workers=PDF_PROCESS_WORKERS,
+            parallel_threshold=PDF_PARALLEL_THRESHOLD
+        )
         quiz_logger.info(f"Processing PDF with {num_pages} pages")
+        if num_pages > MAX_PDF_PAGES:
+            quiz_logger.warning(f"PDF has {num_pages} pages, but only processing the first {MAX_PDF_PAGES} pages")
 
-        max_pages = 50
-        pages_to_process = min(num_pages, max_pages)
-        if num_pages > max_pages:
-            quiz_logger.warning(f"PDF has {num_pages} pages, but only processing the first {max_pages} pages")
-
-        text = [reader.pages[i].extract_text() for i in range(pages_to_process) if reader.pages[i].extract_text().strip()]
+        text = [page_text for _, page_text, _ in pages if page_text.strip()]
         extracted_text = '\n'.join(text)
         processing_time = time.time() - start_time
-        quiz_logger.info(f"Extracted text from {pages_to_process} pages in {processing_time:.2f} seconds")
-        return extracted_text
+        quiz_logger.info(f"Extracted text from {len(pages)} pages in {processing_time:.2f} seconds")
+        record_extraction(len(pages), processing_time, "batch")
+        return extracted_text, summarize_page_timings(pages)
     except Exception as e:
         quiz_logger.error(f"Error extracting text from PDF: {e}")
         raise
 
-# Function to parse plain text into JSON for different question types
-# Function to parse plain text into JSON for different question types
-def parse_plain_text_to_json(response, num_questions, quiz_type, material, difficulty):
+# Function to parse a quiz response (JSON, or numbered plain text as a fallback) into questions.
+# Parsing never calls the model; the caller decides whether to top up a short quiz.
+def parse_plain_text_to_json(response, num_questions, quiz_type, existing=()):
     try:
-        questions = []
-        lines = response.split('\n')
-        current_question = None
-        options = []
-        correct_answer = None
-
-        question_pattern = re.compile(r'^\d+\.\s*(.?)(?:\s_\s*)?$')
-        option_pattern = re.compile(r'^\s*[a-d]\)\s*(.?)\s$')
-        # Updated answer pattern to handle 'Answer: c)' or 'Answer: d)' format
-        answer_pattern = re.compile(r'^Answer:\s*([a-d])\)?\s*$', re.IGNORECASE)
-
-        if quiz_type == "mcq":
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                question_match = question_pattern.match(line)
-                option_match = option_pattern.match(line)
-                answer_match = answer_pattern.match(line)
-
-                if question_match:
-                    question_text = question_match.group(1)
-                    if current_question and len(options) == 4 and correct_answer:
-                        option_label = correct_answer.lower().strip()
-                        if option_label not in ['a', 'b', 'c', 'd']:
-                            quiz_logger.warning(f"Invalid answer label '{correct_answer}' for '{current_question}', skipping")
-                            current_question = question_text
-                            options = []
-                            correct_answer = None
-                            continue
-                        option_index = ord(option_label) - ord('a')
-                        correct_answer_text = options[option_index]
-                        questions.append({
-                            "type": "mcq",
-                            "question": current_question,
-                            "options": options[:4],
-                            "correct_answer": correct_answer_text
-                        })
-                        quiz_logger.info(f"Parsed MCQ: '{current_question}', Answer: '{correct_answer_text}'")
-                    current_question = question_text
-                    options = []
-                    correct_answer = None
-                elif option_match and current_question:
-                    options.append(option_match.group(1))
-                elif answer_match and current_question:
-                    correct_answer = answer_match.group(1).strip().lower()
-                elif line.startswith('Answer:') and current_question:
-                    quiz_logger.warning(f"Malformed answer format '{line}' for '{current_question}', skipping question")
-                    current_question = None
-                    options = []
-                    correct_answer = None
-
-            if current_question and len(options) == 4 and correct_answer:
-                option_label = correct_answer.lower().strip()
-                if option_label in ['a', 'b', 'c', 'd']:
-                    option_index = ord(option_label) - ord('a')
-                    correct_answer_text = options[option_index]
-                    questions.append({
-                        "type": "mcq",
-                        "question": current_question,
-                        "options": options[:4],
-                        "correct_answer": correct_answer_text
-                    })
-                    quiz_logger.info(f"Parsed MCQ: '{current_question}', Answer: '{correct_answer_text}'")
-                else:
-                    quiz_logger.warning(f"Invalid answer label '{correct_answer}' for '{current_question}', skipping")
-
-        elif quiz_type == "true_false":
-            answer_pattern_tf = re.compile(r'^Answer:\s*(True|False)\s*$', re.IGNORECASE)
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                question_match = question_pattern.match(line)
-                answer_match = answer_pattern_tf.match(line)
-                if question_match:
-                    question_text = question_match.group(1)
-                    if current_question and correct_answer:
-                        questions.append({
-                            "type": "true_false",
-                            "question": current_question,
-                            "correct_answer": correct_answer
-                        })
-                        quiz_logger.info(f"Parsed T/F: '{current_question}', Answer: '{correct_answer}'")
-                    current_question = question_text
-                    correct_answer = None
-                elif answer_match and current_question:
-                    correct_answer = answer_match.group(1).capitalize()
-            if current_question and correct_answer:
-                questions.append({
-                    "type": "true_false",
-                    "question": current_question,
-                    "correct_answer": correct_answer
-                })
-                quiz_logger.info(f"Parsed T/F: '{current_question}', Answer: '{correct_answer}'")
-
-        elif quiz_type == "fill_in_the_blank":
-            answer_pattern_fib = re.compile(r'^Answer:\s*(.?)\s$', re.IGNORECASE)
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                question_match = question_pattern.match(line)
-                answer_match = answer_pattern_fib.match(line)
-                if question_match:
-                    question_text = question_match.group(1)
-                    if current_question and correct_answer:
-                        questions.append({
-                            "type": "fill_in_the_blank",
-                            "question": current_question,
-                            "correct_answer": correct_answer
-                        })
-                        quiz_logger.info(f"Parsed Fill-in: '{current_question}', Answer: '{correct_answer}'")
-                    current_question = question_text
-                    correct_answer = None
-                elif answer_match and current_question:
-                    correct_answer = answer_match.group(1).strip()
-            if current_question and correct_answer:
-                questions.append({
-                    "type": "fill_in_the_blank",
-                    "question": current_question,
-                    "correct_answer": correct_answer
-                })
-                quiz_logger.info(f"Parsed Fill-in: '{current_question}', Answer: '{correct_answer}'")
-
-        # Retry if fewer questions than requested
-        if len(questions) < num_questions and "Error: Unable to generate exact number of valid MCQs" not in response:
-            quiz_logger.warning(f"Generated {len(questions)} questions, expected {num_questions}. Retrying up to 3 times...")
-            for attempt in range(3):
-                retry_response = mcq_pipeline.invoke({'material': material, 'difficulty': difficulty, 'num_questions': num_questions - len(questions)})
-                retry_questions = parse_plain_text_to_json(retry_response, num_questions - len(questions), quiz_type, material, difficulty)
-                for q in retry_questions:
-                    if not any(existing_q['question'] == q['question'] for existing_q in questions):
-                        questions.append(q)
-                if len(questions) >= num_questions:
-                    break
-                quiz_logger.warning(f"Attempt {attempt + 1}/3: Generated {len(questions)} questions")
-            if len(questions) < num_questions:
-                quiz_logger.error(f"Failed to generate {num_questions} questions after 3 attempts. Returning {len(questions)} questions.")
-
-        return questions[:num_questions]
+        questions, rejected = parse_questions(response, quiz_type, existing)
+        for q in questions:
+            quiz_logger.debug(f"Parsed {quiz_type}: '{q['question']}', Answer: '{q['correct_answer']}'")
+        if rejected:
+            quiz_logger.warning(f"Rejected {rejected} malformed {quiz_type} questions")
+            QUIZ_PARSE_REJECTED.inc(rejected, quiz_type=quiz_type)
+        if not questions:
+            QUIZ_PARSE_FAILURES.inc(quiz_type=quiz_type)
+        questions, missing = check_count(questions, num_questions)
+        if missing:
+            quiz_logger.warning(f"Parsed {len(questions)} questions, expected {num_questions}")
+        return questions
     except Exception as e:
-        quiz_logger.error(f"Error parsing plain text response: {e}")
+        quiz_logger.error(f"Error parsing quiz response: {e}")
+        QUIZ_PARSE_FAILURES.inc(quiz_type=quiz_type)
         return []
 
+# Function to keep raw quiz responses for the parser benchmark (enabled by QUIZ_RAW_RESPONSE_DIR)
+def save_raw_response(quiz_type, response):
+    if not QUIZ_RAW_RESPONSE_DIR or not response:
+        return
+    try:
+        filename = f"{quiz_type}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S-%f')}.txt"
+        with open(os.path.join(QUIZ_RAW_RESPONSE_DIR, filename), 'w', encoding='utf-8') as f:
+            f.write(response)
+    except OSError as e:
+        quiz_logger.error(f"Failed to save raw quiz response: {e}")
+
 # Function to save quiz to a file
-def save_quiz_to_file(quiz_data):
+def save_quiz_to_file(quiz_data, user_id=None, generation=None):
     try:
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        filename = f"quiz_{timestamp}.json"
-        filepath = os.path.join(QUIZ_STORAGE_DIR, filename)
+        created = datetime.now()
+        timestamp = created.strftime('%Y-%m-%d_%H-%M-%S')
+        quiz_id = new_quiz_id(created)
         data_to_save = {"questions": quiz_data, "timestamp": timestamp}
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, indent=4, ensure_ascii=False)
-        quiz_logger.info(f"Quiz saved to {filepath}")
-        return filename.split('.')[0]
+        if user_id:
+            data_to_save["user_id"] = user_id
+        if generation:
+            data_to_save["generation"] = generation
+        quiz_store.save(quiz_id, data_to_save)
+        dashboard_aggregates.record_quiz(parse_timestamp(timestamp), summarize_quiz(quiz_id, data_to_save))
+        activity_feed.record("quiz", quiz_id=quiz_id, quiz_timestamp=timestamp, percentage=0)
+        quiz_logger.info(f"Quiz {quiz_id} saved to the {quiz_store.backend} store")
+        return quiz_id
     except Exception as e:
         quiz_logger.error(f"Error saving quiz to file: {e}")
         return None
 
-# Route for user registration
+# Function to decode a JWT, reusing the result of an earlier check of the same token
+# Raises jwt.InvalidTokenError for invalid or expired tokens
+def verify_token(token):
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        token_cache.set(token, payload, expires_at=payload.get("exp"))
+    return payload
+
+# Function to fetch a user's public profile ({"name", "email"}), or None if the user does not exist
+def get_user_profile(user_id):
+    profile = user_profile_cache.get(user_id)
+    if profile is None:
+        user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE_PROJECTION)
+        if not user:
+            return None
+        profile = {"name": user.get("name", "Anonymous"), "email": user.get("email")}
+        user_profile_cache.set(user_id, profile)
+    return profile
+
+# Function to forget everything cached about a user after their account changes
+def invalidate_user(user_id):
+    user_profile_cache.pop(user_id)
+    token_cache.pop_where(lambda payload: payload.get("user_id") == user_id)
+
+# Password hashing runs on the "password" pool: bcrypt releases the GIL, so a burst of logins
+# is spread over a fixed number of threads instead of piling CPU work onto request threads
+def hash_password(password):
+    return dispatcher.run("password", bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
+
+def check_password(password, hashed_password):
+    return dispatcher.run("password", bcrypt.checkpw, password.encode('utf-8'), hashed_password)
+
+# Function to tell whether a stored hash was made with a different cost factor than BCRYPT_ROUNDS
+def password_needs_rehash(hashed_password):
+    try:
+        return int(hashed_password.split(b'$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+# Function to replace a user's hash with one at the configured cost, without delaying the login.
+# The update only applies if the hash is unchanged, so a concurrent password change always wins.
+def rehash_password_later(user_id, password, old_hash):
+    def rehash():
+        try:
+            new_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
+            mongo.db.users.update_one({"_id": user_id, "password": old_hash}, {"$set": {"password": new_hash}})
+            quiz_logger.info(f"Rehashed password for user {user_id} with cost {BCRYPT_ROUNDS}")
+        except Exception as e:
+            quiz_logger.error(f"Failed to rehash password for user {user_id}: {e}")
+    dispatcher.submit("password", rehash)
+
+# Route for user login
 @app.route('/api/login', methods=['POST'])
 def login():
     try:
@@ -398,13 +695,15 @@ def login():
             return jsonify({"error": "Email and password are required"}), 400
 
         # Find user by email
-        user = mongo.db.users.find_one({"email": email})
+        user = mongo.db.users.find_one({"email": email}, {"name": 1, "email": 1, "password": 1})
         if not user:
             return jsonify({"error": "Invalid email or password"}), 401
 
         # Verify password
-        if not bcrypt.checkpw(password.encode('utf-8'), user["password"]):
+        if not check_password(password, user["password"]):
             return jsonify({"error": "Invalid email or password"}), 401
+        if password_needs_rehash(user["password"]):
+            rehash_password_later(user["_id"], password, user["password"])
 
         # Generate JWT token
         token = jwt.encode({
@@ -433,16 +732,12 @@ def get_user():
         return jsonify({"error": "No token provided"}), 401
 
     try:
-        payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
-        user_id = payload.get("user_id")
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
+        payload = verify_token(token)
+        profile = get_user_profile(payload.get("user_id"))
+        if not profile:
             return jsonify({"error": "User not found"}), 404
 
-        return jsonify({
-            "name": user.get("name", "Anonymous"),
-            "email": user.get("email")
-        }), 200
+        return jsonify(profile), 200
     except Exception as e:
         quiz_logger.error(f"Error fetching user: {e}")
         return jsonify({"error": "Invalid token"}), 401
@@ -465,10 +760,10 @@ def register():
         if len(password) < 8:
             return jsonify({"error": "Password must be at least 8 characters long"}), 400
 
-        if mongo.db.users.find_one({"email": email}):
+        if mongo.db.users.find_one({"email": email}, {"_id": 1}):
             return jsonify({"error": "Email already registered"}), 400
 
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = hash_password(password)
 
         user = {
             "name": name if name else "Anonymous",
@@ -476,7 +771,12 @@ def register():
             "password": hashed_password,
             "created_at": datetime.utcnow()
         }
-        result = mongo.db.users.insert_one(user)
+        try:
+            result = mongo.db.users.insert_one(user)
+        except DuplicateKeyError:
+            # Another registration for the same email won the race
+            return jsonify({"error": "Email already registered"}), 400
+        invalidate_user(str(result.inserted_id))
 
         token = jwt.encode({
             "user_id": str(result.inserted_id),
@@ -508,7 +808,7 @@ def forgot_password():
             return jsonify({"error": "Email is required"}), 400
 
         # Check if email exists
-        user = mongo.db.users.find_one({"email": email})
+        user = mongo.db.users.find_one({"email": email}, {"_id": 1})
         if not user:
             return jsonify({"error": "Email not found"}), 404
 
@@ -520,43 +820,245 @@ def forgot_password():
         quiz_logger.error(f"Error during forgot password: {e}")
         return jsonify({"error": "Failed to process request. Please try again."}), 500
 
+# Route for changing the password of the logged-in user
+@app.route('/api/change-password', methods=['POST'])
+def change_password():
+    token = request.headers.get('Authorization').replace('Bearer ', '') if request.headers.get('Authorization') else None
+    if not token:
+        return jsonify({"error": "No token provided"}), 401
+    try:
+        user_id = verify_token(token).get("user_id")
+    except jwt.InvalidTokenError:
+        return jsonify({"error": "Invalid token"}), 401
+
+    try:
+        data = request.get_json()
+        current_password = data.get('currentPassword')
+        new_password = data.get('newPassword')
+        confirm_password = data.get('confirmPassword')
+
+        if not all([current_password, new_password, confirm_password]):
+            return jsonify({"error": "Current password, new password, and confirm password are required"}), 400
+
+        if new_password != confirm_password:
+            return jsonify({"error": "Passwords do not match"}), 400
+
+        if len(new_password) < 8:
+            return jsonify({"error": "Password must be at least 8 characters long"}), 400
+
+        user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 1})
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        if not check_password(current_password, user["password"]):
+            return jsonify({"error": "Current password is incorrect"}), 401
+
+        hashed_password = hash_password(new_password)
+        mongo.db.users.update_one({"_id": user["_id"]}, {"$set": {"password": hashed_password}})
+        invalidate_user(user_id)
+
+        quiz_logger.info(f"Password changed for user {user_id}")
+        return jsonify({"message": "Password changed successfully"}), 200
+    except Exception as e:
+        quiz_logger.error(f"Error during password change: {e}")
+        return jsonify({"error": "Failed to change password. Please try again."}), 500
+
+# Function to stream a pipeline's output as newline-delimited JSON
+# Each line is {"token": ...}; the last line is {"done": true, ...} or {"error": ...}
+# cache_if works as in submit_pipeline()
+def stream_pipeline_response(pipeline, input_data, logger, name, use_cache=True, cache_if=None):
+    cache_key = pipeline_cache_key(pipeline, name, input_data, use_cache)
+    cached = llm_cache.get(cache_key) if cache_key else None
+    if cached is not None and cache_if is not None and not cache_if(cached):
+        cached = None
+
+    def generate_cached():
+        logger.info(f"LLM cache hit for {name} pipeline, sending cached response")
+        LLM_CACHE_HITS.inc(pipeline=name)
+        yield json.dumps({"token": cached}, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "done": True,
+            "response": cached,
+            "cached": True,
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False) + "\n"
+
+    def generate():
+        start_time = time.time()
+        first_token_time = None
+        chunks = []
+        token_stream = dispatcher.stream("llm", lambda: pipeline.stream(input_data))
+        completed = False
+        try:
+            for chunk in token_stream:
+                if not chunk:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                    logger.info(f"Time to first token: {first_token_time:.2f} seconds")
+                    LLM_FIRST_TOKEN_SECONDS.observe(first_token_time, pipeline=name)
+                chunks.append(chunk)
+                yield json.dumps({"token": chunk}, ensure_ascii=False) + "\n"
+            completed = True
+            if cache_key and chunks and (cache_if is None or cache_if(''.join(chunks))):
+                llm_cache.set(cache_key, ''.join(chunks), name)
+            processing_time = time.time() - start_time
+            LLM_CALLS.inc(pipeline=name, status='ok')
+            LLM_CALL_SECONDS.observe(processing_time, pipeline=name)
+            logger.info(f"Streamed {len(chunks)} chunks in {processing_time:.2f} seconds")
+            yield json.dumps({
+                "done": True,
+                "response": ''.join(chunks),
+                "time_to_first_token": round(first_token_time, 3) if first_token_time is not None else None,
+                "timestamp": datetime.now().isoformat()
+            }, ensure_ascii=False) + "\n"
+        except GeneratorExit:
+            logger.warning(f"Client disconnected after {len(chunks)} chunks, cancelling generation")
+            LLM_CALLS.inc(pipeline=name, status='cancelled')
+            raise
+        except Exception as e:
+            logger.error(f"Error while streaming pipeline response: {str(e)}", exc_info=True)
+            LLM_CALLS.inc(pipeline=name, status='error')
+            yield json.dumps({"error": f"Internal server error: {str(e)}"}) + "\n"
+        finally:
+            # Closing the LangChain iterator drops the Ollama request so the model is freed early
+            if not completed:
+                token_stream.close()
+
+    return Response(
+        stream_with_context(generate_cached() if cached is not None else generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Function to identify the client for rate limiting: the logged-in user, else the remote address
+def client_key():
+    user_id = get_request_user_id()
+    return f"user:{user_id}" if user_id else f"ip:{request.remote_addr}"
+
+# Function to answer a request that could not be admitted
+def overloaded_response(error, logger):
+    logger.warning(f"Rejected request to {request.path}: {error}")
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after, 'queue_length': error.queue_length})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+# Function to summarize a JSON payload for the logs: its keys, with string values given by length only,
+# so a large document is never formatted into a log line
+def describe_payload(data):
+    if not isinstance(data, dict):
+        return type(data).__name__
+    return ', '.join(
+        f"{key}=<{len(value)} chars>" if isinstance(value, str)
+        else f"{key}={value}" if isinstance(value, (bool, int, float, type(None)))
+        else f"{key}=<{type(value).__name__}>"
+        for key, value in data.items()
+    )
+
+# Function to tell an admitted client how long it queued
+def with_queue_headers(response, ticket):
+    response.headers['X-Queue-Position'] = str(ticket.position)
+    response.headers['X-Queue-Wait'] = f"{ticket.waited:.2f}"
+    return response
+
 # Chat endpoint
 @app.route('/chat', methods=['POST'])
 def chat():
     chat_logger.info("Received a request to /chat endpoint")
     try:
         data = request.get_json()
-        chat_logger.info(f"Received JSON data: {data}")
+        chat_logger.info(f"Received JSON data: {describe_payload(data)}")
         if not data or 'question' not in data:
             chat_logger.error("Invalid request: 'question' field is required")
             return jsonify({"error": "Invalid request: 'question' field is required."}), 400
 
         question = data['question']
-        chat_logger.info(f"Received chat request: {question}")
+        chat_logger.debug(f"Received chat request: {str(question)[:200]}")
 
         if not chat_pipeline:
             chat_logger.error("Chat pipeline is not available due to initialization failure")
             return jsonify({"error": "Chat pipeline is not available due to initialization failure."}), 500
 
-        # Detect summarization intent and select appropriate pipeline
-        is_summarization = any(keyword in question.lower() for keyword in ['summarize', 'summary'])
-        pipeline = summarize_pipeline if is_summarization else chat_pipeline
-        input_data = {"text": question.split(":", 1)[-1].strip()} if is_summarization else {"question": question}
-
-        chat_logger.info("Invoking chat pipeline...")
-        response = pipeline.invoke(input_data)
-        chat_logger.info(f"Chat pipeline response: {response}")
-
-        response_data = {
-            "response": response,
-            "timestamp": datetime.now().isoformat()
-        }
-        chat_logger.info(f"Sending response: {response_data}")
-        return jsonify(response_data)
+        with admission.admit("chat", client_key()) as ticket:
+            activity_feed.record("chat")
+
+            # Detect summarization intent and select appropriate pipeline
+            is_summarization = any(keyword in question.lower() for keyword in ['summarize', 'summary'])
+            pipeline = summarize_pipeline if is_summarization else chat_pipeline
+            pipeline_name = "summarize" if is_summarization else "chat"
+            use_cache = not data.get('fresh', False)
+            if is_summarization:
+                text = question.split(":", 1)[-1].strip()
+                # A document_id from /extract_text can be summarized without re-sending its text
+                if data.get('document_id'):
+                    text = document_store.get_text(data['document_id'])
+                    if text is None:
+                        chat_logger.error(f"Unknown document_id: {data['document_id']}")
+                        return jsonify({"error": "Document not found. Please upload the file again."}), 404
+                input_data = {"text": prepare_summary_input(text, use_cache)}
+            else:
+                input_data = {"question": question}
+
+            # Stream tokens as NDJSON when the client asks for it; the slot is held until the stream ends
+            if data.get('stream'):
+                chat_logger.info("Streaming chat pipeline...")
+                response = stream_pipeline_response(pipeline, input_data, chat_logger, pipeline_name, use_cache)
+                return ticket.hand_off(with_queue_headers(response, ticket))
+
+            chat_logger.info("Invoking chat pipeline...")
+            response = invoke_pipeline(pipeline, input_data, pipeline_name, use_cache)
+            chat_logger.debug(f"Chat pipeline response: {response}")
+
+            response_data = {
+                "response": response,
+                "timestamp": datetime.now().isoformat()
+            }
+            chat_logger.debug(f"Sending response: {response_data}")
+            return with_queue_headers(jsonify(response_data), ticket)
+    except Overloaded as e:
+        return overloaded_response(e, chat_logger)
     except Exception as e:
         chat_logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+# Function to stream extracted PDF pages as newline-delimited JSON
+# Each line is {"page", "text", "seconds"}; the last line is {"done": true, ...} or {"error": ...}
+def stream_pdf_pages(pdf_bytes, document_id, filename):
+    def generate():
+        start_time = time.time()
+        page_count = 0
+        page_texts = []
+        page_info = []
+        try:
+            for index, text, seconds in dispatcher.stream("extraction", lambda: iter_pdf_pages(pdf_bytes)):
+                page_count += 1
+                if text.strip():
+                    page_texts.append(text)
+                page_info.append({"page": index + 1, "characters": len(text), "seconds": round(seconds, 4)})
+                quiz_logger.debug(f"Page {index + 1}: {len(text)} characters in {seconds:.3f} seconds")
+                yield json.dumps({"page": index + 1, "text": text, "seconds": round(seconds, 4)}, ensure_ascii=False) + "\n"
+            processing_time = time.time() - start_time
+            quiz_logger.info(f"Streamed {page_count} pages in {processing_time:.2f} seconds")
+            record_extraction(page_count, processing_time, "stream")
+            if page_texts:
+                document_store.put(document_id, filename, '\n'.join(page_texts), page_info)
+            yield json.dumps({
+                "done": True,
+                "pages": page_count,
+                "seconds": round(processing_time, 3),
+                "document_id": document_id if page_texts else None
+            }) + "\n"
+        except Exception as e:
+            quiz_logger.error(f"Error while streaming PDF pages: {e}")
+            yield json.dumps({"error": f"Failed to extract text: {str(e)}"}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Extract text endpoint
 @app.route('/extract_text', methods=['POST'])
 def extract_text():
@@ -576,17 +1078,37 @@ def extract_text():
             quiz_logger.error('Unsupported file type. Please upload a Word document (.docx) or PDF file.')
             return jsonify({'error': 'Unsupported file type. Please upload a Word document (.docx) or PDF file.'}), 400
 
+        file_bytes = file.read()
+        document_id = hash_document(file_bytes)
+
+        # Stream PDF pages as NDJSON so callers can start on early pages before the file is parsed
+        if filename.endswith('.pdf') and request.args.get('stream'):
+            return stream_pdf_pages(file_bytes, document_id, file.filename)
+
+        # Re-uploads of the same file are served from the document cache
+        cached_document = document_store.get(document_id)
+        if cached_document:
+            quiz_logger.info(f"Document cache hit for {document_id}")
+            return jsonify({
+                'text': cached_document['text'],
+                'pages': cached_document['pages'],
+                'document_id': document_id,
+                'cached': True
+            })
+
+        pages = []
         if filename.endswith('.docx'):
-            text = extract_text_from_docx(file)
+            text = dispatcher.run("extraction", extract_text_from_docx, io.BytesIO(file_bytes))
         else:
-            text = extract_text_from_pdf(file)
+            text, pages = dispatcher.run("extraction", extract_text_from_pdf, file_bytes)
 
         if not text.strip():
             quiz_logger.error('No text could be extracted from the file.')
             return jsonify({'error': 'No text could be extracted from the file.'}), 400
 
+        document_store.put(document_id, file.filename, text, pages)
         quiz_logger.info(f"Extracted text: {text[:100]}...")
-        return jsonify({'text': text})
+        return jsonify({'text': text, 'pages': pages, 'document_id': document_id, 'cached': False})
     except Exception as e:
         quiz_logger.error(f"Error in extract_text endpoint: {str(e)}")
         return jsonify({'error': f'Failed to extract text: {str(e)}'}), 500
@@ -604,102 +1126,349 @@ def parse_timestamp(timestamp_str, default_format='%Y-%m-%d_%H-%M-%S'):
             continue
     raise ValueError(f"Time data {timestamp_str} does not match any format: {formats}")
 
-@app.route('/generate_quiz', methods=['POST'])
-def generate_quiz():
-    quiz_logger.info("Received a request to /generate_quiz endpoint")
+# Function to read the user id from the request's bearer token, or None for anonymous requests
+def get_request_user_id():
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
     try:
-        data = request.get_json()
-        quiz_logger.info(f"Received JSON data: {data}")
+        return verify_token(auth_header[len('Bearer '):]).get("user_id")
+    except jwt.InvalidTokenError:
+        return None
 
-        if not data:
-            quiz_logger.error("No JSON data provided in the request.")
-            return jsonify({'error': 'No JSON data provided in the request.'}), 400
+# Function to validate a quiz generation request
+# Returns (params, None) on success or (None, (error_message, status_code)) on failure
+def parse_quiz_request(data):
+    if not data:
+        quiz_logger.error("No JSON data provided in the request.")
+        return None, ('No JSON data provided in the request.', 400)
+
+    material = data.get('text', '')
+    quiz_type = data.get('question_type', 'multiple-choice')
+
+    # A document_id from /extract_text can be sent instead of the text itself
+    if not material and data.get('document_id'):
+        material = document_store.get_text(data['document_id'])
+        if material is None:
+            quiz_logger.error(f"Unknown document_id: {data['document_id']}")
+            return None, ('Document not found. Please upload the file again.', 404)
+    num_questions = data.get('num_questions', 5)
+    difficulty = data.get('difficulty', 'medium')
+
+    if not material:
+        quiz_logger.error("No study material provided in the request.")
+        return None, ('No study material provided.', 400)
+
+    quiz_type_map = {
+        "multiple-choice": "mcq",
+        "true-false": "true_false",
+        "fill-in-the-blank": "fill_in_the_blank"
+    }
+    quiz_type = quiz_type_map.get(quiz_type, "mcq")
 
-        material = data.get('text', '')
-        quiz_type = data.get('question_type', 'multiple-choice')
-        num_questions = data.get('num_questions', 5)
-        difficulty = data.get('difficulty', 'medium')
+    try:
+        num_questions = int(num_questions)
+        if num_questions < 1 or num_questions > 50:
+            quiz_logger.error(f"Invalid number of questions: {num_questions}. Must be between 1 and 50.")
+            return None, ('Number of questions must be between 1 and 50.', 400)
+    except (ValueError, TypeError):
+        quiz_logger.error(f"Invalid num_questions value: {num_questions}. Must be an integer.")
+        return None, ('Number of questions must be an integer.', 400)
+
+    # Each generation batch gets up to 4000 characters, so larger quizzes can cover more of the material
+    max_material_length = 4000 * -(-num_questions // QUIZ_BATCH_SIZE)
+    if len(material) > max_material_length:
+        material = material[:max_material_length]
+        quiz_logger.warning(f"Material truncated to {max_material_length} characters")
+
+    return {
+        'material': material,
+        'quiz_type': quiz_type,
+        'num_questions': num_questions,
+        'difficulty': difficulty,
+        'use_cache': not data.get('fresh', False),
+        'user_id': get_request_user_id(),
+        'avoid_repeats': bool(data.get('avoid_repeats', False))
+    }, None
+
+# Function to split a quiz request into batches over different slices of the material
+# Returns a list of (material_slice, num_questions) tuples
+def plan_quiz_batches(material, num_questions, batch_size):
+    counts = [batch_size] * (num_questions // batch_size)
+    if num_questions % batch_size:
+        counts.append(num_questions % batch_size)
+    if len(counts) <= 1:
+        return [(material, num_questions)]
+
+    # Each batch sees an evenly spaced window; short material is shared by every batch
+    min_slice_length = 800
+    slice_length = max(len(material) // len(counts), min_slice_length)
+    if slice_length >= len(material):
+        return [(material, count) for count in counts]
+
+    step = (len(material) - slice_length) / (len(counts) - 1)
+    batches = []
+    for i, count in enumerate(counts):
+        start = int(i * step)
+        # Start on a word boundary so the slice does not open mid-word
+        if start > 0:
+            boundary = material.find(' ', start)
+            start = boundary + 1 if 0 <= boundary < start + 50 else start
+        batches.append((material[start:start + slice_length], count))
+    return batches
+
+# Function to build the near-duplicate index for a new quiz.
+# With avoid_repeats it is seeded from the user's recent quizzes (all recent quizzes for anonymous users).
+def build_dedup_index(user_id=None, avoid_repeats=False):
+    dedup_index = NearDuplicateIndex(threshold=QUIZ_DEDUP_THRESHOLD)
+    if avoid_repeats and QUIZ_DEDUP_HISTORY > 0:
+        if user_id:
+            history = quiz_store.recent_for_user(user_id, QUIZ_DEDUP_HISTORY)
+        else:
+            history = quiz_store.recent(QUIZ_DEDUP_HISTORY)
+        for _, quiz_data in history:
+            for q in quiz_data.get("questions", []):
+                dedup_index.add(q.get('question', ''))
+        quiz_logger.info(f"Excluding {len(dedup_index)} questions from {len(history)} previous quizzes")
+    return dedup_index
+
+# Function to keep only questions that are not near-duplicates of ones already in the index
+def filter_new_questions(questions, dedup_index):
+    unique = [q for q in questions if dedup_index.add_if_new(q.get('question', ''))]
+    if len(unique) < len(questions):
+        quiz_logger.info(f"Dropped {len(questions) - len(unique)} near-duplicate questions")
+    return unique
+
+# Function to list already-generated questions for a prompt's exclusion list
+def format_exclusions(questions):
+    recent = [q.get('question', '')[:120] for q in questions[-QUIZ_MAX_EXCLUSIONS:]]
+    return '; '.join(f'"{text}"' for text in recent) if recent else 'none'
+
+# Function to add one quiz's generation cost to the running totals and metrics
+def record_generation_stats(quiz_type, stats):
+    with generation_totals_lock:
+        generation_totals["quizzes"] += 1
+        for key in ("calls", "cache_hits", "topups", "timeouts", "failed_calls"):
+            generation_totals[key] += stats[key]
+    QUIZ_RETRIES.inc(stats["topups"], quiz_type=quiz_type)
+    QUIZ_CALL_TIMEOUTS.inc(stats["timeouts"], quiz_type=quiz_type)
+    QUIZ_GENERATION_SECONDS.observe(stats["seconds"], quiz_type=quiz_type)
+
+# Generation controller: runs the planned batches concurrently and, as soon as a batch comes back
+# short or fails, starts top-up calls for the missing questions alongside the remaining batches.
+# Every model call counts against one budget (planned batches + QUIZ_TOPUP_CALLS); cache hits are free.
+# Returns (questions, stats) where stats records what the quiz actually cost.
+def generate_quiz_questions(quiz_pipeline, quiz_type, batches, num_questions, difficulty, dedup_index,
+                            use_cache=True, progress_callback=None):
+    call_budget = len(batches) + QUIZ_TOPUP_CALLS
+    stats = {"calls": 0, "cache_hits": 0, "topups": 0, "timeouts": 0, "failed_calls": 0, "duplicates": 0}
+    results = []
+    accepted = []
+    pending = {}
+    next_batch = 0
+
+    # Only output that yields questions is cached, so an unparseable response is not replayed
+    # (for free, as far as the call budget goes) to every later request with the same material
+    def parses(quiz_response):
+        return bool(parse_questions(quiz_response, quiz_type)[0])
+
+    def submit(batch_material, batch_count, exclude, fresh):
+        future = submit_pipeline(with_output_cap(quiz_pipeline, quiz_type, batch_count), {
+            'material': batch_material,
+            'difficulty': difficulty,
+            'num_questions': batch_count,
+            'exclude': exclude
+        }, quiz_type, use_cache and not fresh, cache_if=parses,
+            span_attrs={"call": len(results) + 1, "questions": batch_count, "topup": fresh})
+        if getattr(future, 'cached', False):
+            stats["cache_hits"] += 1
+        else:
+            stats["calls"] += 1
+        results.append([])
+        pending[future] = (len(results) - 1, batch_count, time.time() + QUIZ_CALL_TIMEOUT_SECONDS)
+
+    while True:
+        while len(pending) < QUIZ_PARALLEL_BATCHES and stats["calls"] < call_budget:
+            if next_batch < len(batches):
+                batch_material, batch_count = batches[next_batch]
+                submit(batch_material, batch_count, 'none', fresh=False)
+                next_batch += 1
+                continue
+            in_flight = sum(count for _, count, _ in pending.values())
+            missing = num_questions - len(accepted) - in_flight
+            if missing <= 0:
+                break
+            # Top-ups rotate through the batch slices and are told which questions already exist
+            batch_material = batches[stats["topups"] % len(batches)][0]
+            submit(batch_material, min(missing, QUIZ_BATCH_SIZE), format_exclusions(accepted), fresh=True)
+            stats["topups"] += 1
+        if not pending:
+            break
+
+        nearest_deadline = min(deadline for _, _, deadline in pending.values())
+        done, _ = wait(pending, timeout=max(nearest_deadline - time.time(), 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            slot, batch_count, _ = pending.pop(future)
+            try:
+                quiz_response = future.result()
+                quiz_logger.debug(f"Raw quiz response for call {slot + 1}: {quiz_response}")
+                save_raw_response(quiz_type, quiz_response)
+                with span("parse_response", call=slot + 1, characters=len(quiz_response)) as parse_span:
+                    questions = parse_plain_text_to_json(quiz_response, batch_count, quiz_type)
+                    if parse_span:
+                        parse_span.set(questions=len(questions))
+                with span("dedup_filter", call=slot + 1):
+                    results[slot] = filter_new_questions(questions, dedup_index)
+                stats["duplicates"] += len(questions) - len(results[slot])
+                accepted.extend(results[slot])
+            except Exception as e:
+                stats["failed_calls"] += 1
+                quiz_logger.error(f"Quiz generation call {slot + 1} failed: {e}")
+
+        # Abandon calls past their deadline; a call already running finishes in the background
+        # but its result is ignored and it no longer holds up the quiz
+        now = time.time()
+        for future in [f for f, (_, _, deadline) in pending.items() if deadline <= now and not f.done()]:
+            slot, _, _ = pending.pop(future)
+            future.cancel()
+            stats["timeouts"] += 1
+            quiz_logger.warning(f"Quiz generation call {slot + 1} timed out after {QUIZ_CALL_TIMEOUT_SECONDS:.0f} seconds")
+
+        if progress_callback:
+            progress_callback(min(len(accepted), num_questions))
+
+    # Merge in submission order so the planned batches follow the material
+    quiz_data = [q for slot_questions in results for q in slot_questions][:num_questions]
+    return quiz_data, stats
+
+# Function to generate, top up, dedupe and save a quiz
+# progress_callback (optional) receives the number of questions generated so far
+def run_quiz_generation(material, quiz_type, num_questions, difficulty, use_cache=True, user_id=None,
+                        avoid_repeats=False, progress_callback=None):
+    quiz_logger.info(f"Generating quiz with material: {material[:100]}..., quiz_type: {quiz_type}, difficulty: {difficulty}, num_questions: {num_questions}")
+
+    quiz_pipeline = {
+        "mcq": mcq_pipeline,
+        "true_false": true_false_pipeline,
+        "fill_in_the_blank": fill_in_the_blank_pipeline
+    }.get(quiz_type)
+
+    if not quiz_pipeline:
+        raise ValueError(f"Unsupported quiz_type: {quiz_type}")
+
+    start_time = time.time()
+    with span("build_dedup_index", avoid_repeats=avoid_repeats):
+        dedup_index = build_dedup_index(user_id, avoid_repeats)
+    with span("plan_batches"):
+        batches = plan_quiz_batches(material, num_questions, QUIZ_BATCH_SIZE)
+    with span("generate_questions", quiz_type=quiz_type, batches=len(batches)) as generate_span:
+        quiz_data, stats = generate_quiz_questions(
+            quiz_pipeline, quiz_type, batches, num_questions, difficulty, dedup_index, use_cache, progress_callback
+        )
+        if generate_span:
+            generate_span.set(**stats)
+    stats["seconds"] = round(time.time() - start_time, 2)
+    record_generation_stats(quiz_type, stats)
+    quiz_logger.info(
+        f"Quiz generation took {stats['seconds']:.2f} seconds: {stats['calls']} model calls "
+        f"({stats['topups']} top-ups, {stats['timeouts']} timed out, {stats['failed_calls']} failed), "
+        f"{stats['cache_hits']} cache hits, {stats['duplicates']} duplicates dropped"
+    )
+    if not quiz_data:
+        raise QuizGenerationError(
+            f"The model returned no usable questions ({stats['failed_calls']} calls failed, "
+            f"{stats['timeouts']} timed out), please try again later"
+        )
+    if len(quiz_data) < num_questions:
+        quiz_logger.error(f"Call budget spent: returning {len(quiz_data)} of {num_questions} questions")
+
+    with span("save_quiz", questions=len(quiz_data)):
+        quiz_id = save_quiz_to_file(quiz_data, user_id, generation=stats)
+    quiz_logger.debug(f"Generated quiz: {quiz_data}")
+    return quiz_id, quiz_data
+
+# Handler for background jobs run by the job queue
+def handle_job(kind, params, progress_callback):
+    if kind == 'generate_quiz':
+        with traced("job generate_quiz", trace_exporter):
+            quiz_id, quiz_data = run_quiz_generation(progress_callback=progress_callback, **params)
+        if not quiz_id:
+            raise RuntimeError("Quiz was generated but could not be saved")
+        return {'quiz_id': quiz_id, 'num_generated': len(quiz_data)}
+    raise ValueError(f"Unknown job kind: {kind}")
+
+# Persistent queue for long-running quiz generation
+job_queue = JobQueue(
+    os.path.join(DATA_STORAGE_DIR, 'jobs.sqlite3'),
+    handle_job,
+    num_workers=int(os.getenv("JOB_WORKERS", "2"))
+)
 
-        if not material:
-            quiz_logger.error("No study material provided in the request.")
-            return jsonify({'error': 'No study material provided.'}), 400
+@app.route('/generate_quiz', methods=['POST'])
+def generate_quiz():
+    quiz_logger.info(f"Received a request to /generate_quiz endpoint (request {g.trace.request_id})")
+    try:
+        with span("parse_request"):
+            data = request.get_json()
+            quiz_logger.info(f"Received JSON data: {describe_payload(data)}")
+            params, error = parse_quiz_request(data)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+
+        # Async mode: queue the work and return a job id right away
+        if data.get('async'):
+            admission.check_rate("quiz", client_key())
+            queued = job_queue.stats().get('queued', 0)
+            if queued >= JOB_QUEUE_MAX:
+                raise Overloaded("Too many quiz jobs waiting, please retry shortly",
+                                 admission.lanes["quiz"].avg_seconds or 60, queued)
+            job_id = job_queue.enqueue('generate_quiz', params, total=params['num_questions'])
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'queue_position': job_queue.position(job_id),
+                'status_url': f"/quiz-jobs/{job_id}"
+            }), 202
+
+        with admission.admit("quiz", client_key()) as ticket:
+            current_span().set(queue_wait_ms=round(ticket.waited * 1000, 1))
+            quiz_id, quiz_data = run_quiz_generation(**params)
+            return with_queue_headers(jsonify({'quiz_id': quiz_id, 'questions': quiz_data}), ticket)
+    except Overloaded as e:
+        return overloaded_response(e, quiz_logger)
+    except QuizGenerationError as e:
+        quiz_logger.error(str(e))
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        quiz_logger.error(str(e))
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        quiz_logger.error(f"Error in generate_quiz: {str(e)}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
-        quiz_type_map = {
-            "multiple-choice": "mcq",
-            "true-false": "true_false",
-            "fill-in-the-blank": "fill_in_the_blank"
+@app.route('/quiz-jobs/<job_id>', methods=['GET'])
+def get_quiz_job(job_id):
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        response = {
+            'job_id': job['id'],
+            'status': job['status'],
+            'questions_generated': job['progress'],
+            'questions_requested': job['total'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at']
         }
-        quiz_type = quiz_type_map.get(quiz_type, "mcq")
-
-        try:
-            num_questions = int(num_questions)
-            if num_questions < 1 or num_questions > 50:
-                quiz_logger.error(f"Invalid number of questions: {num_questions}. Must be between 1 and 50.")
-                return jsonify({'error': 'Number of questions must be between 1 and 50.'}), 400
-        except (ValueError, TypeError):
-            quiz_logger.error(f"Invalid num_questions value: {num_questions}. Must be an integer.")
-            return jsonify({'error': 'Number of questions must be an integer.'}), 400
-
-        max_material_length = 4000
-        if len(material) > max_material_length:
-            material = material[:max_material_length]
-            quiz_logger.warning(f"Material truncated to {max_material_length} characters")
-
-        quiz_logger.info(f"Generating quiz with material: {material[:100]}..., quiz_type: {quiz_type}, difficulty: {difficulty}, num_questions: {num_questions}")
-
-        quiz_pipeline = {
-            "mcq": mcq_pipeline,
-            "true_false": true_false_pipeline,
-            "fill_in_the_blank": fill_in_the_blank_pipeline
-        }.get(quiz_type)
-
-        if not quiz_pipeline:
-            quiz_logger.error(f"Unsupported quiz_type: {quiz_type}")
-            return jsonify({'error': f'Unsupported quiz_type: {quiz_type}'}), 400
-
-        start_time = time.time()
-        quiz_response = quiz_pipeline.invoke({
-            'material': material,
-            'difficulty': difficulty,
-            'num_questions': num_questions
-        })
-        processing_time = time.time() - start_time
-        quiz_logger.info(f"Quiz generation took {processing_time:.2f} seconds")
-        quiz_logger.info(f"Raw quiz response: {quiz_response}")
-
-        quiz_data = parse_plain_text_to_json(quiz_response, num_questions, quiz_type, material, difficulty)
-        quiz_id = save_quiz_to_file(quiz_data)
-
-        if len(quiz_data) < num_questions:
-            quiz_logger.warning(f"Generated {len(quiz_data)} questions, expected {num_questions}. Retrying up to 3 times...")
-            for attempt in range(3):
-                retry_response = quiz_pipeline.invoke({
-                    'material': material,
-                    'difficulty': difficulty,
-                    'num_questions': num_questions - len(quiz_data)
-                })
-                retry_questions = parse_plain_text_to_json(retry_response, num_questions - len(quiz_data), quiz_type, material, difficulty)
-                quiz_data.extend([q for q in retry_questions if not any(existing_q['question'] == q['question'] for existing_q in quiz_data)])
-                if len(quiz_data) >= num_questions:
-                    break
-                quiz_logger.warning(f"Attempt {attempt + 1}/3: Generated {len(quiz_data)} questions")
-            if len(quiz_data) < num_questions:
-                quiz_logger.error(f"Failed to generate {num_questions} questions after 3 attempts. Returning {len(quiz_data)} questions.")
-
-        # Remove duplicates based on question text
-        seen_questions = set()
-        unique_quiz_data = []
-        for q in quiz_data:
-            question_text = q.get('question', '')
-            if question_text not in seen_questions:
-                seen_questions.add(question_text)
-                unique_quiz_data.append(q)
-        quiz_data = unique_quiz_data[:num_questions]
-
-        quiz_logger.info(f"Generated quiz: {quiz_data}")
-        return jsonify({'quiz_id': quiz_id, 'questions': quiz_data})
+        if job['status'] == 'queued':
+            response['queue_position'] = job_queue.position(job_id)
+        if job['status'] == 'completed' and job['result']:
+            response['quiz_id'] = job['result'].get('quiz_id')
+        if job['status'] == 'failed':
+            response['error'] = job['error']
+        return jsonify(response), 200
     except Exception as e:
-        quiz_logger.error(f"Error in generate_quiz: {str(e)}")
+        quiz_logger.error(f"Error in get_quiz_job: {str(e)}", exc_info=True)
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
 
@@ -728,61 +1497,263 @@ if not hasattr(migrate_quiz_files, 'run_once'):
     migrate_quiz_files()
     migrate_quiz_files.run_once = True
 
-
+# Quiz repository: "files" (one JSON file per quiz), "sqlite" or "mongo"
+QUIZ_STORE_BACKEND = os.getenv("QUIZ_STORE_BACKEND", "files")
+quiz_store = create_quiz_store(
+    QUIZ_STORE_BACKEND,
+    QUIZ_STORAGE_DIR,
+    sqlite_path=os.path.join(DATA_STORAGE_DIR, 'quizzes.sqlite3'),
+    mongo_db=mongo.db
+)
+quiz_logger.info(f"Using {quiz_store.backend} quiz store")
+
+# Move quiz files from the old flat directory into dated shards (ids stay the same)
+if quiz_store.backend == 'files':
+    quiz_store.migrate_layout()
+
+# Hot cache of parsed quizzes for /get-quiz and answer submission (QUIZ_CACHE_ENTRIES=0 disables it)
+QUIZ_CACHE_ENTRIES = int(os.getenv("QUIZ_CACHE_ENTRIES", "512"))
+if QUIZ_CACHE_ENTRIES > 0:
+    quiz_store = CachedQuizStore(
+        quiz_store,
+        max_entries=QUIZ_CACHE_ENTRIES,
+        ttl_seconds=int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "600"))
+    )
+
+# Answers are either written into the stored quiz right away ("rewrite")
+# or appended to a per-quiz log that is compacted into the quiz later ("log")
+ANSWER_WRITE_MODE = os.getenv("ANSWER_WRITE_MODE", "rewrite")
+answer_log = AnswerLog(
+    os.path.join(DATA_STORAGE_DIR, 'answer_logs'),
+    compact_every=int(os.getenv("ANSWER_LOG_COMPACT_EVERY", "20"))
+)
+quiz_locks = KeyedLocks()
+
+# Seed an empty indexed store from the existing JSON files on first start
+if quiz_store.backend != 'files' and quiz_store.count() == 0:
+    import_json_quizzes(quiz_store, QUIZ_STORAGE_DIR)
+
+# CLI: flask --app main import-quizzes [--overwrite]
+@app.cli.command('import-quizzes')
+@click.option('--overwrite', is_flag=True, help='Replace quizzes that already exist in the store.')
+def import_quizzes_command(overwrite):
+    """Import quiz JSON files from generated_quizzes into the configured quiz store."""
+    imported = import_json_quizzes(quiz_store, QUIZ_STORAGE_DIR, overwrite=overwrite)
+    click.echo(f"Imported {imported} quizzes into the {quiz_store.backend} store")
+    rebuild_dashboard_aggregates()
+
+# CLI: flask --app main migrate-quiz-layout
+@app.cli.command('migrate-quiz-layout')
+def migrate_quiz_layout_command():
+    """Move quiz JSON files from the flat generated_quizzes directory into dated shards."""
+    moved = FileQuizStore(QUIZ_STORAGE_DIR).migrate_layout()
+    click.echo(f"Moved {moved} quizzes into dated shards")
+
+# Recent user activity (chats, quizzes) for /recent-activity
+activity_feed = ActivityFeed(
+    os.path.join(DATA_STORAGE_DIR, 'activity.jsonl'),
+    capacity=int(os.getenv("ACTIVITY_FEED_CAPACITY", "1000"))
+)
+
+# Running dashboard totals, maintained by save_quiz_to_file and submit_answer
+dashboard_aggregates = DashboardAggregates(os.path.join(DATA_STORAGE_DIR, 'dashboard_aggregates.json'))
+
+# Function to recompute the dashboard totals from every stored quiz
+def rebuild_dashboard_aggregates():
+    # Stored summaries only reflect answers that have been compacted
+    for quiz_id in answer_log.pending_quiz_ids():
+        with quiz_locks.hold(quiz_id):
+            compact_answer_log(quiz_id)
+    entries = []
+    for summary in quiz_store.summaries():
+        try:
+            entries.append((parse_timestamp(summary['timestamp']), summary))
+        except ValueError as e:
+            quiz_logger.error(f"Error processing {summary['quiz_id']}: {e}")
+    dashboard_aggregates.rebuild(entries)
+    return len(entries)
+
+# CLI: flask --app main rebuild-dashboard
+@app.cli.command('rebuild-dashboard')
+def rebuild_dashboard_command():
+    """Recompute the running dashboard totals from the quiz store."""
+    count = rebuild_dashboard_aggregates()
+    click.echo(f"Rebuilt dashboard aggregates from {count} quizzes")
+
+
+
+# Function to score answers into a quiz and recompute its totals
+# Raises IndexError for an out-of-range question index
+def apply_answers(quiz_data, answers):
+    questions = quiz_data.get('questions', [])
+    for answer in answers:
+        question_index = answer['question_index']
+        if not isinstance(question_index, int) or not 0 <= question_index < len(questions):
+            raise IndexError(question_index)
+        user_answer = answer['user_answer']
+        correct_answer = questions[question_index].get('correct_answer')
+        questions[question_index]['user_answer'] = user_answer
+        questions[question_index]['score'] = 1 if str(user_answer).lower() == str(correct_answer).lower() else 0
+    quiz_data['questions'] = questions
+
+    # Calculate total score and percentage
+    total_questions = len(questions)
+    total_correct = sum(q.get('score', 0) for q in questions)
+    quiz_data['total_score'] = total_correct
+    quiz_data['percentage'] = (total_correct / total_questions * 100) if total_questions > 0 else 0
+    return quiz_data
+
+# Function to load a quiz with any logged answers that have not been compacted yet
+# (also in rewrite mode, where they are left over from running in log mode)
+def load_quiz(quiz_id):
+    quiz_data = quiz_store.get(quiz_id)
+    if quiz_data is not None:
+        logged_answers = answer_log.read(quiz_id)
+        if logged_answers:
+            apply_answers(quiz_data, logged_answers)
+    return quiz_data
+
+# Function to fold a quiz's answer log into the stored quiz; the caller must hold the quiz lock
+def compact_answer_log(quiz_id):
+    count = answer_log.compact(quiz_id, quiz_store, apply_answers)
+    quiz_logger.info(f"Compacted {count} logged answers for quiz {quiz_id}")
+
+# Function to record answers for a quiz; updates for one quiz are serialized
+# Returns the updated quiz, or None if it does not exist
+def record_answers(quiz_id, answers):
+    with quiz_locks.hold(quiz_id):
+        quiz_data = load_quiz(quiz_id)
+        if quiz_data is None:
+            return None
+        old_summary = summarize_quiz(quiz_id, quiz_data)
+        apply_answers(quiz_data, answers)
+
+        if ANSWER_WRITE_MODE == 'log':
+            log_length = answer_log.append(quiz_id, answers)
+            if answer_log.needs_compaction(log_length):
+                compact_answer_log(quiz_id)
+        else:
+            quiz_store.save(quiz_id, quiz_data)
+            # The saved quiz now includes any answers left in the log by log mode
+            answer_log.clear(quiz_id)
+
+        new_summary = summarize_quiz(quiz_id, quiz_data)
+
+    # The aggregates only take score differences, so they need not be updated under the quiz lock
+    dashboard_aggregates.update_quiz(parse_timestamp(new_summary['timestamp']), old_summary, new_summary)
+    activity_feed.record("quiz", quiz_id=quiz_id, quiz_timestamp=new_summary['timestamp'], percentage=quiz_data['percentage'])
+    return quiz_data
+
+# CLI: flask --app main compact-answers
+@app.cli.command('compact-answers')
+def compact_answers_command():
+    """Fold every pending answer log into its stored quiz."""
+    quiz_ids = answer_log.pending_quiz_ids()
+    for quiz_id in quiz_ids:
+        with quiz_locks.hold(quiz_id):
+            compact_answer_log(quiz_id)
+    click.echo(f"Compacted answer logs for {len(quiz_ids)} quizzes")
 
 @app.route('/submit_answer', methods=['POST'])
 def submit_answer():
     quiz_logger.info("Received a request to /submit-answer endpoint")
     try:
         data = request.get_json()
-        quiz_logger.info(f"Received JSON data: {data}")
+        quiz_logger.info(f"Received JSON data: {describe_payload(data)}")
 
         quiz_id = data.get('quiz_id')
         question_index = data.get('question_index')
         user_answer = data.get('user_answer')
 
-        if not all([quiz_id, question_index, user_answer]):
+        if not quiz_id or question_index is None or not user_answer:
             quiz_logger.error("Missing required fields: quiz_id, question_index, or user_answer")
             return jsonify({'error': 'Missing required fields.'}), 400
 
-        filepath = os.path.join(QUIZ_STORAGE_DIR, f"{quiz_id}.json")
-        if not os.path.exists(filepath):
-            quiz_logger.error(f"Quiz file not found: {filepath}")
-            return jsonify({'error': 'Quiz not found.'}), 404
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            quiz_data = json.load(f)
-        questions = quiz_data.get('questions', [])
-        if 0 <= question_index < len(questions):
-            questions[question_index]['user_answer'] = user_answer
-            correct_answer = questions[question_index].get('correct_answer')
-            questions[question_index]['score'] = 1 if user_answer.lower() == correct_answer.lower() else 0
-            quiz_data['questions'] = questions
-            
-            # Calculate total score and percentage
-            total_questions = len(questions)
-            total_correct = sum(q.get('score', 0) for q in questions)
-            quiz_data['total_score'] = total_correct
-            quiz_data['percentage'] = (total_correct / total_questions * 100) if total_questions > 0 else 0
-
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(quiz_data, f, indent=4, ensure_ascii=False)
-            quiz_logger.info(f"Updated answer for quiz {quiz_id}, question {question_index}")
-            return jsonify({'status': 'success', 'total_score': quiz_data['total_score'], 'percentage': quiz_data['percentage']}), 200
-        else:
+        try:
+            quiz_data = record_answers(quiz_id, [{'question_index': question_index, 'user_answer': user_answer}])
+        except IndexError:
             quiz_logger.error(f"Invalid question_index: {question_index}")
             return jsonify({'error': 'Invalid question index.'}), 400
+        if quiz_data is None:
+            quiz_logger.error(f"Quiz not found: {quiz_id}")
+            return jsonify({'error': 'Quiz not found.'}), 404
+
+        quiz_logger.info(f"Updated answer for quiz {quiz_id}, question {question_index}")
+        return jsonify({'status': 'success', 'total_score': quiz_data['total_score'], 'percentage': quiz_data['percentage']}), 200
     except Exception as e:
         quiz_logger.error(f"Error in submit_answer: {str(e)}")
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
+# Batch endpoint: score a whole answer sheet with a single write
+# Body: {"quiz_id": ..., "answers": [{"question_index": 0, "user_answer": "..."}, ...]}
+@app.route('/submit_answers', methods=['POST'])
+def submit_answers():
+    quiz_logger.info("Received a request to /submit_answers endpoint")
+    try:
+        data = request.get_json()
+        quiz_id = data.get('quiz_id') if data else None
+        answers = data.get('answers') if data else None
+
+        if not quiz_id or not isinstance(answers, list) or not answers:
+            quiz_logger.error("Missing required fields: quiz_id or answers")
+            return jsonify({'error': 'Missing required fields.'}), 400
+        if not all(isinstance(a, dict) and a.get('question_index') is not None and a.get('user_answer') for a in answers):
+            quiz_logger.error("Each answer needs question_index and user_answer")
+            return jsonify({'error': 'Each answer needs question_index and user_answer.'}), 400
+
+        answers = [{'question_index': a['question_index'], 'user_answer': a['user_answer']} for a in answers]
+        try:
+            quiz_data = record_answers(quiz_id, answers)
+        except IndexError as e:
+            quiz_logger.error(f"Invalid question_index: {e}")
+            return jsonify({'error': 'Invalid question index.'}), 400
+        if quiz_data is None:
+            quiz_logger.error(f"Quiz not found: {quiz_id}")
+            return jsonify({'error': 'Quiz not found.'}), 404
+
+        questions = quiz_data['questions']
+        quiz_logger.info(f"Recorded {len(answers)} answers for quiz {quiz_id}")
+        return jsonify({
+            'status': 'success',
+            'scores': [{'question_index': a['question_index'], 'score': questions[a['question_index']]['score']} for a in answers],
+            'total_score': quiz_data['total_score'],
+            'percentage': quiz_data['percentage']
+        }), 200
+    except Exception as e:
+        quiz_logger.error(f"Error in submit_answers: {str(e)}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+# Function to turn the running totals into the dashboard response
+def compute_dashboard_stats(totals):
+    total_sessions = totals['total_sessions']
+    quizzes_completed = totals['total_questions']
+    average_score = (totals['score_sum'] / totals['num_scored'] * 100) if totals['num_scored'] else 0
+
+    last_week_sessions = totals['last_week_sessions']
+    last_week_questions = totals['last_week_questions']
+    last_week_average_score = (totals['last_week_score_sum'] / last_week_questions * 100) if last_week_questions else 0
+
+    trends = {
+        "sessions": ((total_sessions - last_week_sessions) / last_week_sessions * 100) if last_week_sessions else (total_sessions * 100) if total_sessions > 0 else 0,
+        "quizzes": ((quizzes_completed - last_week_questions) / last_week_questions * 100) if last_week_questions else (quizzes_completed * 100) if quizzes_completed > 0 else 0,
+        "score": ((average_score - last_week_average_score) / last_week_average_score * 100) if last_week_average_score else (average_score * 100) if average_score > 0 else 0
+    }
+
+    return {
+        "total_study_sessions": total_sessions,
+        "quizzes_completed": quizzes_completed,
+        "average_score": round(average_score, 2),
+        "study_streak": totals['study_streak'],
+        "trends": {k: round(v, 2) for k, v in trends.items()}
+    }
+
 @app.route('/dashboard-stats', methods=['GET'])
 def get_dashboard_stats():
     quiz_logger.info("Received a request to /dashboard-stats endpoint")
     try:
-        quiz_files = [f for f in os.listdir(QUIZ_STORAGE_DIR) if f.endswith('.json')]
-        if not quiz_files:
-            quiz_logger.info("No quiz files found")
+        totals = dashboard_aggregates.totals()
+        if not totals['total_sessions']:
+            quiz_logger.info("No quizzes found")
             return jsonify({
                 "total_study_sessions": 0,
                 "quizzes_completed": 0,
@@ -791,77 +1762,7 @@ def get_dashboard_stats():
                 "trends": {"sessions": 0, "quizzes": 0, "score": 0}
             }), 200
 
-        total_sessions = len(quiz_files)
-        total_questions = 0
-        total_correct = 0
-        scores = []
-        timestamps = []
-
-        for quiz_file in quiz_files:
-            filepath = os.path.join(QUIZ_STORAGE_DIR, quiz_file)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    quiz_data = json.load(f)
-                quiz_logger.debug(f"Loaded {quiz_file}: {json.dumps(quiz_data)[:100]}...")
-                if not isinstance(quiz_data, dict):
-                    quiz_logger.warning(f"Skipping {quiz_file} due to invalid format: {type(quiz_data)}")
-                    continue
-                questions = quiz_data.get('questions', [])
-                if not isinstance(questions, list):
-                    quiz_logger.warning(f"Invalid questions format in {quiz_file}")
-                    continue
-                total_questions += len(questions)
-                for question in questions:
-                    if not isinstance(question, dict):
-                        quiz_logger.warning(f"Invalid question in {quiz_file}")
-                        continue
-                    if 'user_answer' in question and 'correct_answer' in question:
-                        if question['user_answer'] == question['correct_answer']:
-                            total_correct += 1
-                    if 'score' in question:
-                        scores.append(float(question.get('score', 0)))
-                timestamp_str = quiz_data.get('timestamp', quiz_file.split('_')[1].split('.')[0])
-                timestamps.append(parse_timestamp(timestamp_str))
-            except json.JSONDecodeError as e:
-                quiz_logger.error(f"Corrupted file {quiz_file}: {e}")
-                continue
-            except Exception as e:
-                quiz_logger.error(f"Error processing {quiz_file}: {e}")
-                continue
-
-        quizzes_completed = total_questions
-        average_score = (sum(scores) / len(scores) * 100) if scores else 0
-
-        study_streak = 1
-        if timestamps:
-            timestamps.sort()
-            current_streak = 1
-            for i in range(1, len(timestamps)):
-                if (timestamps[i] - timestamps[i-1]).days == 1:
-                    current_streak += 1
-                else:
-                    current_streak = 1
-                study_streak = max(study_streak, current_streak)
-
-        last_week = datetime.now() - timedelta(days=7)
-        last_week_files = [f for f in quiz_files if parse_timestamp(f.split('_')[1].split('.')[0]) < last_week]
-        last_week_questions = sum(len(json.load(open(os.path.join(QUIZ_STORAGE_DIR, f), 'r', encoding='utf-8')).get('questions', [])) for f in last_week_files if os.path.exists(os.path.join(QUIZ_STORAGE_DIR, f)))
-        last_week_scores = [float(q.get('score', 0)) for f in last_week_files if os.path.exists(os.path.join(QUIZ_STORAGE_DIR, f)) for q in json.load(open(os.path.join(QUIZ_STORAGE_DIR, f), 'r', encoding='utf-8')).get('questions', [])]
-        last_week_average_score = (sum(last_week_scores) / len(last_week_scores) * 100) if last_week_scores else 0
-
-        trends = {
-            "sessions": ((total_sessions - len(last_week_files)) / len(last_week_files) * 100) if last_week_files else (total_sessions * 100) if total_sessions > 0 else 0,
-            "quizzes": ((quizzes_completed - last_week_questions) / last_week_questions * 100) if last_week_questions else (quizzes_completed * 100) if quizzes_completed > 0 else 0,
-            "score": ((average_score - last_week_average_score) / last_week_average_score * 100) if last_week_average_score else (average_score * 100) if average_score > 0 else 0
-        }
-
-        response = {
-            "total_study_sessions": total_sessions,
-            "quizzes_completed": quizzes_completed,
-            "average_score": round(average_score, 2),
-            "study_streak": study_streak,
-            "trends": {k: round(v, 2) for k, v in trends.items()}
-        }
+        response = compute_dashboard_stats(totals)
         quiz_logger.info(f"Dashboard stats: {response}")
         return jsonify(response), 200
     except Exception as e:
@@ -872,50 +1773,44 @@ def get_dashboard_stats():
 def get_recent_activity():
     quiz_logger.info("Received a request to /recent-activity endpoint")
     try:
-        activities = []
-        quiz_files = [f for f in os.listdir(QUIZ_STORAGE_DIR) if f.endswith('.json')]
-        log_files = [os.path.join(LOG_STORAGE_DIR, 'quiz_logs.log'), os.path.join(LOG_STORAGE_DIR, 'chat_logs.log')]
-
-        for quiz_file in sorted(quiz_files, key=lambda x: os.path.getmtime(os.path.join(QUIZ_STORAGE_DIR, x)), reverse=True)[:3]:
-            filepath = os.path.join(QUIZ_STORAGE_DIR, quiz_file)
+        quiz_activities = []
+        chat_activities = []
+        seen_quizzes = set()
+
+        # Newest events first; each quiz is shown once with its latest score
+        for event in activity_feed.recent():
+            if len(quiz_activities) >= 3 and len(chat_activities) >= 5:
+                break
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    quiz_data = json.load(f)
-                questions = quiz_data.get('questions', [])
-                percentage = quiz_data.get('percentage', 0)  # Use the stored percentage
-                timestamp_str = quiz_data.get('timestamp', quiz_file.split('_')[1].split('.')[0])
-                timestamp = parse_timestamp(timestamp_str)
-                activities.append({
-                    "id": len(activities) + 1,
-                    "type": "quiz",
-                    "title": "Quiz Completed",
-                    "description": f"{timestamp.strftime('%Y-%m-%d')} - Score: {percentage:.0f}%",
-                    "time": time_ago(timestamp.strftime('%Y-%m-%d %H:%M:%S')),
-                    "icon": "Brain",
-                    "quiz_id": quiz_file.split('.')[0],
-                    "score": percentage  # Use the stored percentage
-                })
+                if event['type'] == 'quiz' and event['quiz_id'] not in seen_quizzes and len(quiz_activities) < 3:
+                    seen_quizzes.add(event['quiz_id'])
+                    percentage = event.get('percentage', 0)
+                    timestamp = parse_timestamp(event['quiz_timestamp'])
+                    quiz_activities.append({
+                        "type": "quiz",
+                        "title": "Quiz Completed",
+                        "description": f"{timestamp.strftime('%Y-%m-%d')} - Score: {percentage:.0f}%",
+                        "time": time_ago(timestamp.strftime('%Y-%m-%d %H:%M:%S')),
+                        "icon": "Brain",
+                        "quiz_id": event['quiz_id'],
+                        "score": percentage
+                    })
+                elif event['type'] == 'chat' and len(chat_activities) < 5:
+                    chat_activities.append({
+                        "type": "chat",
+                        "title": "AI Chat Session",
+                        "description": "User interaction",
+                        "time": time_ago(event['time']),
+                        "icon": "MessageSquare"
+                    })
             except Exception as e:
-                quiz_logger.error(f"Error processing {quiz_file} for activity: {e}")
+                quiz_logger.error(f"Error processing activity event {event}: {e}")
                 continue
 
-        for log_file in log_files:
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    for line in f.readlines()[-10:]:
-                        match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', line)
-                        if match and "Received a request to /chat" in line:
-                            timestamp_str = match.group(1)
-                            activities.append({
-                                "id": len(activities) + 1,
-                                "type": "chat",
-                                "title": "AI Chat Session",
-                                "description": "User interaction",
-                                "time": time_ago(timestamp_str),
-                                "icon": "MessageSquare"
-                            })
-
-        return jsonify(activities[:5])
+        activities = (quiz_activities + chat_activities)[:5]
+        for i, activity in enumerate(activities):
+            activity["id"] = i + 1
+        return jsonify(activities)
     except Exception as e:
         quiz_logger.error(f"Error in get_recent_activity: {str(e)}", exc_info=True)
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
@@ -939,12 +1834,10 @@ def time_ago(timestamp_str):
 def get_quiz(quiz_id):
     quiz_logger.info(f"Received a request to /get-quiz/{quiz_id}")
     try:
-        filepath = os.path.join(QUIZ_STORAGE_DIR, f"{quiz_id}.json")
-        if not os.path.exists(filepath):
-            quiz_logger.error(f"Quiz file not found: {filepath}")
+        quiz_data = load_quiz(quiz_id)
+        if quiz_data is None:
+            quiz_logger.error(f"Quiz not found: {quiz_id}")
             return jsonify({"error": "Quiz not found"}), 404
-        with open(filepath, 'r', encoding='utf-8') as f:
-            quiz_data = json.load(f)
         if not isinstance(quiz_data, dict) or 'questions' not in quiz_data:
             quiz_logger.error(f"Invalid quiz format in {quiz_id}")
             return jsonify({"error": "Invalid quiz format"}), 400
@@ -954,6 +1847,11 @@ def get_quiz(quiz_id):
         quiz_logger.error(f"Error in get_quiz: {str(e)}", exc_info=True)
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+# Prometheus metrics endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -966,7 +1864,18 @@ def health_check():
             'chat_pipeline_available': chat_pipeline is not None,
             'summarize_pipeline_available': summarize_pipeline is not None,
             'quiz_pipelines_available': all([mcq_pipeline, true_false_pipeline, fill_in_the_blank_pipeline]),
-            'mongo_connected': True
+            'mongo_connected': True,
+            'workers': dispatcher.stats(),
+            'ollama': ollama_clients.stats(),
+            'admission': admission.stats(),
+            'llm_cache': llm_cache.stats() if llm_cache else None,
+            'document_cache': document_store.stats(),
+            'quiz_store': quiz_store.backend,
+            'quiz_cache': quiz_store.stats() if isinstance(quiz_store, CachedQuizStore) else None,
+            'quiz_generation': dict(generation_totals),
+            'auth_cache': {'tokens': token_cache.stats(), 'profiles': user_profile_cache.stats()},
+            'tracing': trace_exporter.stats(),
+            'jobs': job_queue.stats()
         }), 200
     except Exception as e:
         quiz_logger.error(f"MongoDB health check failed: {e}")
@@ -980,5 +1889,31 @@ def health_check():
             'error': str(e)
         }), 500
 
-if _name_ == '_main_':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+# Seed an empty activity feed with the most recent quizzes
+if not len(activity_feed):
+    for quiz_id, quiz_data in reversed(quiz_store.recent(3)):
+        activity_feed.record(
+            "quiz",
+            quiz_id=quiz_id,
+            quiz_timestamp=quiz_data.get('timestamp', quiz_id.split('_', 1)[-1]),
+            percentage=quiz_data.get('percentage', 0)
+        )
+
+# Build the dashboard totals on first start
+if not dashboard_aggregates.exists():
+    rebuild_dashboard_aggregates()
+
+# Start background workers once every store they depend on is ready
+job_queue.start()
+
+if __name__ == '__main__':
+    # Spawned PDF workers would otherwise re-run this whole file (Mongo, model warm-up, ...) as __mp_main__;
+    # they only need extraction.py, which they import themselves
+    sys.modules['__main__'].__spec__ = importlib.machinery.ModuleSpec('__main__', None)
+    # SERVER_MODE=production serves through waitress with a thread pool sized by SERVER_THREADS
+    if os.getenv("SERVER_MODE", "development") == "production":
+        from waitress import serve
+        quiz_logger.info(f"Starting production server with {SERVER_THREADS} threads")
+        serve(app, host='0.0.0.0', port=5000, threads=SERVER_THREADS)
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,44 @@
+import os
+
+# Model settings per pipeline. Every field can be overridden from the environment as
+# <TASK>_MODEL, <TASK>_NUM_CTX, <TASK>_NUM_PREDICT and <TASK>_TEMPERATURE,
+# e.g. CHAT_MODEL=mistral:7b-instruct-q4_K_M or TRUE_FALSE_NUM_CTX=1536.
+#
+# Context sizes follow the largest input each task can receive: chat questions are short,
+# summaries see up to SUMMARY_CHUNK_CHARS characters plus a 300-400 word answer, and quiz batches
+# see up to 4000 characters of material. num_predict caps the output; quiz caps are worked out
+# per call from the number of questions asked for (see output_cap).
+DEFAULT_PROFILES = {
+    "chat": {"model": "mistral:latest", "num_ctx": 2048, "num_predict": 512, "temperature": 0.7},
+    "summarize": {"model": "mistral:latest", "num_ctx": 3072, "num_predict": 700, "temperature": 0.5},
+    "summarize_chunk": {"model": "mistral:latest", "num_ctx": 2048, "num_predict": 300, "temperature": 0.3},
+    "mcq": {"model": "mistral:latest", "num_ctx": 2048, "num_predict": None, "temperature": 0.7},
+    "true_false": {"model": "mistral:latest", "num_ctx": 2048, "num_predict": None, "temperature": 0.5},
+    "fill_in_the_blank": {"model": "mistral:latest", "num_ctx": 2048, "num_predict": None, "temperature": 0.7},
+}
+
+# Output tokens budgeted per question (question, options and JSON syntax) and per response
+TOKENS_PER_QUESTION = {"mcq": 110, "true_false": 45, "fill_in_the_blank": 60}
+RESPONSE_OVERHEAD_TOKENS = 40
+
+_CASTS = {"model": str, "num_ctx": int, "num_predict": int, "temperature": float}
+
+
+# Function to build the profile for one task from the defaults and the environment
+def load_profile(task, environ=os.environ):
+    profile = dict(DEFAULT_PROFILES[task])
+    for field, cast in _CASTS.items():
+        value = environ.get(f"{task.upper()}_{field.upper()}")
+        if value:
+            profile[field] = cast(value)
+    return profile
+
+
+def load_profiles(environ=os.environ):
+    return {task: load_profile(task, environ) for task in DEFAULT_PROFILES}
+
+
+# Function to cap a quiz response at what num_questions questions need, with 50% headroom
+# so a slightly verbose model is not cut off mid-JSON
+def output_cap(quiz_type, num_questions):
+    return int((TOKENS_PER_QUESTION[quiz_type] * num_questions + RESPONSE_OVERHEAD_TOKENS) * 1.5)
@@ -0,0 +1,289 @@
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_ollama import ChatOllama
+
+from metrics import Counter, Histogram
+from tracing import current_span
+
+logger = logging.getLogger('quiz')
+
+ENDPOINT_CALLS = Counter('ollama_endpoint_calls_total', 'Model calls per Ollama endpoint', ['endpoint', 'status'])
+ENDPOINT_FAILOVERS = Counter('ollama_endpoint_failovers_total', 'Calls retried on another endpoint because theirs was down', ['endpoint'])
+LLM_TOKENS = Counter('llm_tokens_total', 'Prompt (in) and generated (out) tokens reported by Ollama', ['pipeline', 'endpoint', 'direction'])
+LLM_TOKENS_PER_SECOND = Histogram(
+    'llm_generation_tokens_per_second', 'Generation speed reported by Ollama (eval_count / eval_duration)',
+    ['pipeline', 'endpoint'], buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+)
+
+
+# One Ollama server and its live load
+class OllamaEndpoint:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.models = []
+        self.last_probe = None
+        self.last_error = None
+
+
+# Tracks a set of Ollama servers: health probes, model warm-up and least-loaded routing.
+# Chat models built by chat_model() pick an endpoint per call. Each endpoint has one connection pool
+# (an httpx transport, sync and async) shared by every chat model, so pool_connections caps the
+# connections to a server however many pipelines there are.
+class OllamaClientManager:
+    def __init__(self, urls, keep_alive='30m', probe_interval=30, probe_timeout=3,
+                 pool_connections=8, request_timeout=None):
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        if not self.endpoints:
+            raise ValueError("At least one Ollama endpoint is required")
+        self.keep_alive = keep_alive
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.pool_connections = pool_connections
+        self.request_timeout = request_timeout
+        limits = httpx.Limits(max_connections=pool_connections, max_keepalive_connections=pool_connections)
+        self._transports = {
+            endpoint.url: (httpx.HTTPTransport(limits=limits), httpx.AsyncHTTPTransport(limits=limits))
+            for endpoint in self.endpoints
+        }
+        self._lock = threading.Lock()
+        self._models = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _request(self, endpoint, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(f"{endpoint.url}{path}", data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=timeout or self.probe_timeout) as response:
+            return json.loads(response.read().decode('utf-8') or '{}')
+
+    # Check one endpoint and record whether it is reachable and which models it has
+    def probe(self, endpoint):
+        try:
+            tags = self._request(endpoint, '/api/tags')
+            models = [m.get('name') for m in tags.get('models', [])]
+            error = None
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            models, error = None, str(e)
+        with self._lock:
+            was_healthy = endpoint.healthy
+            endpoint.healthy = error is None
+            endpoint.last_probe = time.time()
+            endpoint.last_error = error
+            if models is not None:
+                endpoint.models = models
+        if was_healthy and error:
+            logger.warning(f"Ollama endpoint {endpoint.url} is unreachable: {error}")
+        elif not was_healthy and not error:
+            logger.info(f"Ollama endpoint {endpoint.url} is reachable again")
+        return error is None
+
+    def probe_all(self):
+        return [self.probe(endpoint) for endpoint in self.endpoints]
+
+    # Load a model into memory on every healthy endpoint so the first real request does not pay for it.
+    # An empty prompt makes Ollama load the model and return without generating anything.
+    def warm_up(self, model):
+        for endpoint in self.endpoints:
+            if not endpoint.healthy:
+                continue
+            start_time = time.time()
+            try:
+                self._request(endpoint, '/api/generate', {
+                    'model': model, 'prompt': '', 'stream': False, 'keep_alive': self.keep_alive
+                }, timeout=600)
+                logger.info(f"Warmed up {model} on {endpoint.url} in {time.time() - start_time:.2f} seconds")
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                logger.warning(f"Failed to warm up {model} on {endpoint.url}: {e}")
+
+    # Probe every endpoint in the background; warm up the models once they are reachable
+    def start(self, warm_up=True):
+        if self._thread is not None:
+            return
+
+        def run():
+            self.probe_all()
+            if warm_up:
+                for model in sorted(self._models):
+                    self.warm_up(model)
+            while not self._stop.wait(self.probe_interval):
+                self.probe_all()
+
+        self._thread = threading.Thread(target=run, name="ollama-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Reserve the healthy endpoint with the fewest calls in flight (all endpoints if none look healthy)
+    @contextmanager
+    def acquire(self, exclude=()):
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude]
+            healthy = [e for e in candidates if e.healthy] or candidates
+            endpoint = min(healthy, key=lambda e: (e.in_flight, e.requests))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+
+    # Called when a call fails; returns True if the endpoint itself is down (so another one may be tried)
+    def report_failure(self, endpoint):
+        with self._lock:
+            endpoint.failures += 1
+        return not self.probe(endpoint)
+
+    def has_alternative(self, exclude):
+        return any(e.healthy and e.url not in exclude for e in self.endpoints)
+
+    def _client_kwargs(self):
+        return {"timeout": self.request_timeout} if self.request_timeout else {}
+
+    # Build a chat model that routes each call to the least-loaded endpoint.
+    # task names the pipeline in metrics; it is not passed to the model.
+    def chat_model(self, task=None, **model_kwargs):
+        with self._lock:
+            self._models.add(model_kwargs['model'])
+        clients = {
+            endpoint.url: ChatOllama(
+                base_url=endpoint.url,
+                keep_alive=self.keep_alive,
+                client_kwargs=self._client_kwargs(),
+                sync_client_kwargs={"transport": self._transports[endpoint.url][0]},
+                async_client_kwargs={"transport": self._transports[endpoint.url][1]},
+                **model_kwargs
+            )
+            for endpoint in self.endpoints
+        }
+        return RoutedChatModel(self, clients, model_kwargs, task)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "healthy": e.healthy,
+                    "in_flight": e.in_flight,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "models": e.models,
+                    "last_error": e.last_error
+                }
+                for e in self.endpoints
+            ]
+
+
+# Chat model step for a pipeline (prompt | model | parser) that spreads calls over several endpoints.
+# A call that fails because its endpoint went down is retried on another endpoint; streams are only
+# retried if nothing has been yielded yet.
+class RoutedChatModel(Runnable):
+    def __init__(self, manager, clients, model_kwargs, task=None):
+        self.manager = manager
+        self.clients = clients
+        self.model_kwargs = model_kwargs
+        self.task = task or model_kwargs.get('model')
+        self._variants = {}
+        self._variants_lock = threading.Lock()
+
+    # Same model with some options changed (e.g. num_predict); the copies share the pooled HTTP clients
+    def with_options(self, **overrides):
+        key = tuple(sorted(overrides.items()))
+        with self._variants_lock:
+            if key not in self._variants:
+                clients = {url: client.model_copy(update=overrides) for url, client in self.clients.items()}
+                self._variants[key] = RoutedChatModel(self.manager, clients, {**self.model_kwargs, **overrides}, self.task)
+            return self._variants[key]
+
+    # Attributes read by pipeline_fingerprint()
+    @property
+    def model(self):
+        return self.model_kwargs.get('model')
+
+    @property
+    def num_ctx(self):
+        return self.model_kwargs.get('num_ctx')
+
+    @property
+    def temperature(self):
+        return self.model_kwargs.get('temperature')
+
+    @property
+    def format(self):
+        return self.model_kwargs.get('format')
+
+    @property
+    def num_predict(self):
+        return self.model_kwargs.get('num_predict')
+
+    # Record token counts and speed from the metadata Ollama returns with the last message chunk,
+    # in the metrics and on the current trace span
+    def _record_usage(self, endpoint, message):
+        metadata = getattr(message, 'response_metadata', None) or {}
+        usage = getattr(message, 'usage_metadata', None) or {}
+        prompt_tokens = metadata.get('prompt_eval_count', usage.get('input_tokens'))
+        output_tokens = metadata.get('eval_count', usage.get('output_tokens'))
+        span = current_span()
+        if span:
+            span.set(endpoint=endpoint.url, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                     done_reason=metadata.get('done_reason'))
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, pipeline=self.task, endpoint=endpoint.url, direction='in')
+        if output_tokens:
+            LLM_TOKENS.inc(output_tokens, pipeline=self.task, endpoint=endpoint.url, direction='out')
+            if metadata.get('eval_duration'):
+                LLM_TOKENS_PER_SECOND.observe(output_tokens / (metadata['eval_duration'] / 1e9),
+                                              pipeline=self.task, endpoint=endpoint.url)
+
+    def _failed(self, endpoint, tried):
+        ENDPOINT_CALLS.inc(endpoint=endpoint.url, status='error')
+        tried.add(endpoint.url)
+        if not (self.manager.report_failure(endpoint) and self.manager.has_alternative(tried)):
+            return False
+        ENDPOINT_FAILOVERS.inc(endpoint=endpoint.url)
+        logger.warning(f"Ollama endpoint {endpoint.url} is down, retrying on another endpoint")
+        return True
+
+    def invoke(self, input, config=None, **kwargs):
+        tried = set()
+        while True:
+            with self.manager.acquire(exclude=tried) as endpoint:
+                try:
+                    message = self.clients[endpoint.url].invoke(input, config, **kwargs)
+                except Exception:
+                    if not self._failed(endpoint, tried):
+                        raise
+                    continue
+                ENDPOINT_CALLS.inc(endpoint=endpoint.url, status='ok')
+                self._record_usage(endpoint, message)
+                return message
+
+    def stream(self, input, config=None, **kwargs):
+        tried = set()
+        while True:
+            last_chunk = None
+            with self.manager.acquire(exclude=tried) as endpoint:
+                try:
+                    for chunk in self.clients[endpoint.url].stream(input, config, **kwargs):
+                        last_chunk = chunk
+                        yield chunk
+                except Exception:
+                    if last_chunk is not None or not self._failed(endpoint, tried):
+                        raise
+                    continue
+                ENDPOINT_CALLS.inc(endpoint=endpoint.url, status='ok')
+                self._record_usage(endpoint, last_chunk)
+                return
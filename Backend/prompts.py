@@ -0,0 +1,61 @@
+# Prompt templates for every pipeline, kept apart from the app so benchmarks can use the exact prompts
+
+# Chat prompt
+CHAT_PROMPT = (
+    "You are EduMind Chatbot, an AI assistant designed to help students learn and explore knowledge. "
+    "Answer the following question in a clear and concise manner: {question}"
+)
+
+# Summarization prompt
+SUMMARIZE_PROMPT = (
+    "You are EduMind Chatbot. Provide a detailed summary of the following text in exactly 2 paragraphs, totaling 300-400 words. "
+    "Focus on the main ideas, key details, and overall context, omitting minor details. Use natural paragraph breaks and ensure the summary is comprehensive. "
+    "Output only the summary with no additional text or explanations. Text to summarize: {text}"
+)
+
+# Chunk summarization prompt, used for the map step of long documents
+SUMMARIZE_CHUNK_PROMPT = (
+    "You are EduMind Chatbot. Summarize the following section of a longer document in one paragraph of at most 150 words. "
+    "Keep the key facts, definitions and names so the section can be combined with summaries of the other sections. "
+    "Output only the summary with no additional text or explanations. Section: {text}"
+)
+
+# MCQ prompt; the quiz model runs in Ollama's JSON mode, so questions come back as a JSON object
+MCQ_PROMPT = (
+    "Generate EXACTLY {num_questions} multiple-choice questions (MCQs) at {difficulty} difficulty level based on the following material: {material}. "
+    "Each MCQ MUST have EXACTLY one correct answer among four distinct options. "
+    "You MUST generate ONLY multiple-choice questions with four options and a single correct answer. "
+    "Do NOT generate True/False, Fill-in-the-Blank, or questions with multiple correct answers. "
+    "The answer MUST be a single letter: a, b, c, or d, naming the correct option. "
+    "Each MCQ must be unique, cover different aspects of the material, and avoid repetition. "
+    "Do NOT repeat or rephrase any of these already-asked questions: {exclude}. "
+    "Respond with a JSON object of exactly this shape: "
+    "{{\"questions\": [{{\"question\": \"<question>\", \"options\": [\"<option a>\", \"<option b>\", \"<option c>\", \"<option d>\"], \"answer\": \"<a, b, c, or d>\"}}]}}. "
+    "Return only the JSON object, with no additional text or comments."
+)
+
+# True/False Prompt
+TRUE_FALSE_PROMPT = (
+    "Generate exactly {num_questions} True/False questions at {difficulty} difficulty level based on the following material: {material}. "
+    "You MUST generate EXACTLY {num_questions} questions, with no fewer and no more. "
+    "ONLY generate True/False questions. Do NOT generate multiple-choice, fill-in-the-blank, or any other question types under any circumstances. "
+    "Each question must be a statement that is either True or False. "
+    "Ensure questions are diverse, cover different aspects of the material, and do not repeat or focus on the same topic excessively. "
+    "Do NOT repeat or rephrase any of these already-asked questions: {exclude}. "
+    "Respond with a JSON object of exactly this shape: "
+    "{{\"questions\": [{{\"question\": \"<statement>\", \"answer\": \"<True or False>\"}}]}}. "
+    "Return only the JSON object, with no additional text."
+)
+
+# Fill-in-the-Blank Prompt
+FILL_IN_THE_BLANK_PROMPT = (
+    "Generate exactly {num_questions} Fill-in-the-Blank questions at {difficulty} difficulty level based on the following material: {material}. "
+    "You MUST generate EXACTLY {num_questions} questions, with no fewer and no more. "
+    "ONLY generate Fill-in-the-Blank questions. Do NOT generate multiple-choice, true/false, or any other question types under any circumstances. "
+    "Each question must be a sentence with a blank (_____) and an answer that fits the blank. "
+    "Ensure questions are diverse, cover different aspects of the material, and do not repeat or focus on the same topic excessively. "
+    "Do NOT repeat or rephrase any of these already-asked questions: {exclude}. "
+    "Respond with a JSON object of exactly this shape: "
+    "{{\"questions\": [{{\"question\": \"<sentence with a blank _____>\", \"answer\": \"<correct word/phrase>\"}}]}}. "
+    "Return only the JSON object, with no additional text."
+)
@@ -0,0 +1,53 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+# Quiz ids are "quiz_" + a ULID: 48 bits of milliseconds since the epoch and 80 random bits in
+# Crockford base32. They sort by creation time, and ids made in the same millisecond by this
+# process increase monotonically, so two quizzes can no longer share an id.
+# Ids from before the switch ("quiz_<%Y-%m-%d_%H-%M-%S>") are still understood everywhere.
+
+_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_ULID_PATTERN = re.compile(r'^quiz_([0-9A-HJKMNP-TV-Z]{26})$')
+_LEGACY_PATTERN = re.compile(r'^quiz_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})$')
+LEGACY_FORMAT = '%Y-%m-%d_%H-%M-%S'
+
+_lock = threading.Lock()
+_last = [0, 0]
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+# Function to create a new quiz id for the given time (a datetime, default now)
+def new_quiz_id(when=None):
+    millis = int((when.timestamp() if when else time.time()) * 1000)
+    with _lock:
+        if millis <= _last[0]:
+            millis = _last[0]
+            randomness = _last[1] + 1
+        else:
+            randomness = int.from_bytes(os.urandom(10), 'big')
+        _last[0], _last[1] = millis, randomness
+    return f"quiz_{_encode(millis, 10)}{_encode(randomness & ((1 << 80) - 1), 16)}"
+
+
+# Function to recover the creation time (local time) from a quiz id, or None if it is not a quiz id
+def quiz_id_time(quiz_id):
+    match = _ULID_PATTERN.match(quiz_id)
+    if match:
+        millis = 0
+        for char in match.group(1)[:10]:
+            millis = millis * 32 + _ALPHABET.index(char)
+        return datetime.fromtimestamp(millis / 1000)
+    match = _LEGACY_PATTERN.match(quiz_id)
+    if match:
+        return datetime.strptime(match.group(1), LEGACY_FORMAT)
+    return None
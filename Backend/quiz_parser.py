@@ -0,0 +1,168 @@
+import json
+import re
+
+# Parsing, validation, dedup and count checks for quiz responses.
+# Everything here is pure: no logging, no model calls, no I/O.
+
+OPTION_LABELS = ['a', 'b', 'c', 'd']
+
+# One combined pattern per line: a numbered question, a lettered option, or an answer
+_LINE_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'(?:Q(?:uestion)?\s*)?(?P<number>\d+)\s*[.):]\s*(?P<question>.+)'
+    r'|\(?(?P<label>[a-dA-D])\s*[).:]\s+(?P<option>.+)'
+    r'|[*_]*(?:correct\s+)?answer[*_]*\s*[:\-]\s*[*_]*(?P<answer>.+?)[*_]*'
+    r')\s*$',
+    re.IGNORECASE
+)
+_OPTION_PREFIX = re.compile(r'^\s*\(?[a-dA-D]\s*[).:]\s+')
+_ANSWER_LABEL = re.compile(r'^\(?([a-dA-D])\)?(?:[).:]|\s|$)')
+
+
+# Function to normalise question text for duplicate checks
+def normalize_question(text):
+    return re.sub(r'\W+', ' ', str(text).lower()).strip()
+
+
+# Function to pull the JSON payload out of a response, tolerating code fences and chatter around it
+def _load_json(response):
+    text = response.strip()
+    fenced = re.search(r'```(?:json)?\s*(.*?)```', text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+    end = max(text.rfind('}'), text.rfind(']'))
+    if end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+
+def _json_candidates(payload):
+    if isinstance(payload, dict):
+        for key in ('questions', 'quiz', 'items', 'mcqs'):
+            if isinstance(payload.get(key), list):
+                return payload[key]
+        if 'question' in payload:
+            return [payload]
+        return None
+    if isinstance(payload, list):
+        return payload
+    return None
+
+
+# Function to parse numbered plain-text questions in a single pass over the lines
+def _parse_text(response):
+    candidates = []
+    current = None
+    for line in response.splitlines():
+        if not line.strip():
+            continue
+        match = _LINE_PATTERN.match(line)
+        if match is None:
+            # Unlabelled lines continue a question that has no options yet
+            if current is not None and not current['options'] and 'answer' not in current:
+                current['question'] = f"{current['question']} {line.strip()}"
+            continue
+        if match.group('question') is not None:
+            current = {'question': match.group('question').strip(), 'options': []}
+            candidates.append(current)
+        elif current is None:
+            continue
+        elif match.group('option') is not None:
+            current['options'].append(match.group('option').strip())
+        elif match.group('answer') is not None:
+            current['answer'] = match.group('answer').strip()
+    return candidates
+
+
+# Function to turn a raw model response into candidate question dicts.
+# JSON (from format=json prompts) is tried first, then the plain-text format.
+def parse_quiz_response(response):
+    if not response:
+        return []
+    candidates = _json_candidates(_load_json(response))
+    if candidates:
+        return [c for c in candidates if isinstance(c, dict)]
+    return _parse_text(response)
+
+
+def _answer_value(candidate):
+    for key in ('answer', 'correct_answer', 'correct'):
+        if key in candidate:
+            return candidate[key]
+    return None
+
+
+# Function to validate one candidate and return it in the stored quiz shape, or None
+def validate_question(candidate, quiz_type):
+    question = str(candidate.get('question', '')).strip()
+    answer = _answer_value(candidate)
+    if not question or answer is None or str(answer).strip() == '':
+        return None
+
+    if quiz_type == 'mcq':
+        options = candidate.get('options')
+        if isinstance(options, dict):
+            options = [options.get(label, options.get(label.upper())) for label in OPTION_LABELS]
+        if not isinstance(options, list) or len(options) != 4 or any(o is None for o in options):
+            return None
+        options = [_OPTION_PREFIX.sub('', str(o)).strip() for o in options]
+        if any(not o for o in options) or len({o.lower() for o in options}) != 4:
+            return None
+        answer = str(answer).strip()
+        label = _ANSWER_LABEL.match(answer)
+        if label:
+            correct_answer = options[OPTION_LABELS.index(label.group(1).lower())]
+        else:
+            # The model sometimes answers with the option text instead of the letter
+            matches = [o for o in options if o.lower() == _OPTION_PREFIX.sub('', answer).strip().lower()]
+            if not matches:
+                return None
+            correct_answer = matches[0]
+        return {"type": "mcq", "question": question, "options": options, "correct_answer": correct_answer}
+
+    if quiz_type == 'true_false':
+        if isinstance(answer, bool):
+            correct_answer = 'True' if answer else 'False'
+        else:
+            word = str(answer).strip().strip('.').lower()
+            if word not in ('true', 'false'):
+                return None
+            correct_answer = word.capitalize()
+        return {"type": "true_false", "question": question, "correct_answer": correct_answer}
+
+    if quiz_type == 'fill_in_the_blank':
+        return {"type": "fill_in_the_blank", "question": question, "correct_answer": str(answer).strip()}
+
+    return None
+
+
+# Function to drop questions whose normalised text was already seen (in this list or in `existing`)
+def dedupe_questions(questions, existing=()):
+    seen = {normalize_question(q['question']) for q in existing}
+    unique = []
+    for q in questions:
+        key = normalize_question(q['question'])
+        if key not in seen:
+            seen.add(key)
+            unique.append(q)
+    return unique
+
+
+# Function to trim to the requested count; returns (questions, number still missing)
+def check_count(questions, num_questions):
+    return questions[:num_questions], max(num_questions - len(questions), 0)
+
+
+# Function to run the whole pipeline: parse, validate, dedupe.
+# Returns (questions, rejected) where rejected counts candidates that failed validation.
+def parse_questions(response, quiz_type, existing=()):
+    candidates = parse_quiz_response(response)
+    valid = [q for q in (validate_question(c, quiz_type) for c in candidates) if q is not None]
+    return dedupe_questions(valid, existing), len(candidates) - len(valid)
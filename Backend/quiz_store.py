@@ -0,0 +1,530 @@
+import copy
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from quiz_ids import LEGACY_FORMAT, quiz_id_time
+
+logger = logging.getLogger('quiz')
+
+
+# Function to fall back on the creation time in the id when a quiz has no timestamp field
+def _id_timestamp(quiz_id):
+    created = quiz_id_time(quiz_id)
+    return created.strftime(LEGACY_FORMAT) if created else quiz_id.split('_', 1)[-1]
+
+
+# Function to derive the per-quiz numbers the dashboard aggregates over
+def summarize_quiz(quiz_id, quiz_data):
+    questions = quiz_data.get('questions', [])
+    if not isinstance(questions, list):
+        questions = []
+    questions = [q for q in questions if isinstance(q, dict)]
+    return {
+        "quiz_id": quiz_id,
+        "timestamp": quiz_data.get('timestamp') or _id_timestamp(quiz_id),
+        "num_questions": len(questions),
+        "num_correct": sum(1 for q in questions if 'user_answer' in q and 'correct_answer' in q and q['user_answer'] == q['correct_answer']),
+        "num_scored": sum(1 for q in questions if 'score' in q),
+        "score_sum": sum(float(q.get('score', 0)) for q in questions),
+        "percentage": quiz_data.get('percentage', 0)
+    }
+
+
+# Per-quiz locks so read-modify-write updates to the same quiz are serialized
+class KeyedLocks:
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._users = {}
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._guard:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    del self._locks[key]
+
+
+# Function to format the optional since/until bounds of a range query like stored timestamps
+def _timestamp_bounds(since=None, until=None):
+    return (since.strftime(LEGACY_FORMAT) if since else None, until.strftime(LEGACY_FORMAT) if until else None)
+
+
+# Number of quiz ids kept per user for recent_for_user()
+USER_INDEX_SIZE = 100
+
+
+# Quiz repository backed by one JSON file per quiz, sharded into one directory per day
+# (<directory>/<YYYY-MM>/<DD>/<quiz_id>.json) using the creation time encoded in the id.
+# Files from the original flat layout are still found until migrate_layout() moves them.
+# <directory>/_users/<user_id>.json lists each user's latest quiz ids, oldest first.
+class FileQuizStore:
+    backend = 'files'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.users_directory = os.path.join(directory, '_users')
+        self._users_lock = threading.Lock()
+        if not os.path.isdir(self.users_directory):
+            self._build_user_index()
+
+    def _shard(self, created):
+        return os.path.join(self.directory, created.strftime('%Y-%m'), created.strftime('%d'))
+
+    # Where a quiz is written: its day shard, or the top level for ids without a time
+    def _path(self, quiz_id):
+        if not re.fullmatch(r'[\w-]+', quiz_id):
+            raise ValueError(f"Invalid quiz id: {quiz_id}")
+        created = quiz_id_time(quiz_id)
+        directory = self._shard(created) if created else self.directory
+        return os.path.join(directory, f"{quiz_id}.json")
+
+    def _flat_path(self, quiz_id):
+        return os.path.join(self.directory, f"{quiz_id}.json")
+
+    # Where a quiz currently is (sharded or still flat), or None
+    def _locate(self, quiz_id):
+        try:
+            filepath = self._path(quiz_id)
+        except ValueError:
+            return None
+        if os.path.exists(filepath):
+            return filepath
+        flat_path = self._flat_path(quiz_id)
+        return flat_path if os.path.exists(flat_path) else None
+
+    # Yields (quiz_id, filepath) for every stored quiz; day shards outside [since, until) are skipped
+    def _entries(self, since=None, until=None):
+        with os.scandir(self.directory) as top:
+            for entry in top:
+                if entry.is_file() and entry.name.endswith('.json'):
+                    quiz_id = entry.name[:-len('.json')]
+                    created = quiz_id_time(quiz_id)
+                    if created is None or ((not since or created >= since) and (not until or created < until)):
+                        yield quiz_id, entry.path
+                elif entry.is_dir() and re.fullmatch(r'\d{4}-\d{2}', entry.name):
+                    for day in sorted(os.listdir(entry.path)):
+                        try:
+                            day_start = datetime.strptime(f"{entry.name}-{day}", '%Y-%m-%d')
+                        except ValueError:
+                            continue
+                        if (since and day_start + timedelta(days=1) <= since) or (until and day_start >= until):
+                            continue
+                        day_path = os.path.join(entry.path, day)
+                        for filename in os.listdir(day_path):
+                            if filename.endswith('.json'):
+                                yield filename[:-len('.json')], os.path.join(day_path, filename)
+
+    # Yields (quiz_id, filepath) newest first by creation time, reading one day shard at a time;
+    # quizzes whose id carries no time come last
+    def _entries_newest_first(self):
+        months = sorted((name for name in os.listdir(self.directory) if re.fullmatch(r'\d{4}-\d{2}', name)), reverse=True)
+        for month in months:
+            month_path = os.path.join(self.directory, month)
+            for day in sorted(os.listdir(month_path), reverse=True):
+                day_path = os.path.join(month_path, day)
+                if not os.path.isdir(day_path):
+                    continue
+                quiz_ids = [name[:-len('.json')] for name in os.listdir(day_path) if name.endswith('.json')]
+                for quiz_id in sorted(quiz_ids, key=lambda q: (quiz_id_time(q) or datetime.min, q), reverse=True):
+                    yield quiz_id, os.path.join(day_path, f"{quiz_id}.json")
+        flat = [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+        for quiz_id in sorted(flat, key=lambda q: (quiz_id_time(q) or datetime.min, q), reverse=True):
+            yield quiz_id, self._flat_path(quiz_id)
+
+    def _read(self, quiz_id, filepath):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error reading {quiz_id}.json: {e}")
+            return None
+
+    def _user_index_path(self, user_id):
+        filename = re.sub(r'[^\w-]', '_', str(user_id))
+        return os.path.join(self.users_directory, f"{filename}.json")
+
+    def _read_user_index(self, user_id):
+        try:
+            with open(self._user_index_path(user_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Could not read the quiz index of user {user_id}: {e}")
+            return []
+
+    def _write_user_index(self, user_id, quiz_ids):
+        os.makedirs(self.users_directory, exist_ok=True)
+        filepath = self._user_index_path(user_id)
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(quiz_ids[-USER_INDEX_SIZE:], f)
+        os.replace(tmp_path, filepath)
+
+    def _index_user_quiz(self, user_id, quiz_id):
+        with self._users_lock:
+            quiz_ids = self._read_user_index(user_id)
+            if quiz_id not in quiz_ids:
+                quiz_ids.append(quiz_id)
+                self._write_user_index(user_id, quiz_ids)
+
+    # One-off scan that lists every user's latest quizzes (for stores created before the index)
+    def _build_user_index(self):
+        by_user = {}
+        for quiz_id, filepath in self._entries_newest_first():
+            quiz_data = self._read(quiz_id, filepath)
+            user_id = quiz_data.get('user_id') if isinstance(quiz_data, dict) else None
+            if user_id and len(by_user.setdefault(user_id, [])) < USER_INDEX_SIZE:
+                by_user[user_id].append(quiz_id)
+        os.makedirs(self.users_directory, exist_ok=True)
+        for user_id, quiz_ids in by_user.items():
+            self._write_user_index(user_id, list(reversed(quiz_ids)))
+        if by_user:
+            logger.info(f"Indexed the quizzes of {len(by_user)} users under {self.users_directory}")
+
+    def get(self, quiz_id):
+        filepath = self._locate(quiz_id)
+        if filepath is None:
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # Write to a temporary file and swap it in, so readers never see a half-written quiz.
+    # Saving a quiz that is still in the flat layout moves it into its shard.
+    def save(self, quiz_id, quiz_data):
+        filepath = self._path(quiz_id)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(quiz_data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, filepath)
+        flat_path = self._flat_path(quiz_id)
+        if flat_path != filepath and os.path.exists(flat_path):
+            os.remove(flat_path)
+        if isinstance(quiz_data, dict) and quiz_data.get('user_id'):
+            self._index_user_quiz(quiz_data['user_id'], quiz_id)
+
+    def exists(self, quiz_id):
+        return self._locate(quiz_id) is not None
+
+    # Cheap change marker used by the quiz cache; None if the quiz does not exist
+    def version(self, quiz_id):
+        filepath = self._locate(quiz_id)
+        try:
+            return os.stat(filepath).st_mtime_ns if filepath else None
+        except FileNotFoundError:
+            return None
+
+    def count(self):
+        return sum(1 for _ in self._entries())
+
+    # Yields (quiz_id, quiz_data) for every readable quiz, optionally only those created in [since, until)
+    def iter_quizzes(self, since=None, until=None):
+        for quiz_id, filepath in self._entries(since, until):
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    quiz_data = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Corrupted file {quiz_id}.json: {e}")
+                continue
+            if isinstance(quiz_data, dict):
+                yield quiz_id, quiz_data
+            else:
+                logger.warning(f"Skipping {quiz_id}.json due to invalid format: {type(quiz_data)}")
+
+    def summaries(self, since=None, until=None):
+        return [summarize_quiz(quiz_id, quiz_data) for quiz_id, quiz_data in self.iter_quizzes(since, until)]
+
+    # Most recently created quizzes first; only the newest day shards are read
+    def recent(self, limit):
+        recent = []
+        for quiz_id, filepath in self._entries_newest_first():
+            if len(recent) >= limit:
+                break
+            quiz_data = self._read(quiz_id, filepath)
+            if quiz_data is not None:
+                recent.append((quiz_id, quiz_data))
+        return recent
+
+    # A user's most recently created quizzes first, from their quiz index
+    def recent_for_user(self, user_id, limit):
+        recent = []
+        for quiz_id in reversed(self._read_user_index(user_id)[-limit:] if limit > 0 else []):
+            quiz_data = self.get(quiz_id)
+            if quiz_data is not None:
+                recent.append((quiz_id, quiz_data))
+        return recent
+
+    # Move quizzes from the flat layout into day shards; returns the number moved
+    def migrate_layout(self):
+        moved = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            quiz_id = filename[:-len('.json')]
+            if quiz_id_time(quiz_id) is None:
+                logger.warning(f"Cannot tell when {filename} was created, leaving it in place")
+                continue
+            target = self._path(quiz_id)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(self.directory, filename), target)
+            moved += 1
+        if moved:
+            logger.info(f"Moved {moved} quizzes into dated shards under {self.directory}")
+        return moved
+
+
+# Quiz repository backed by an embedded SQLite database with indexes on timestamp and update time
+class SQLiteQuizStore:
+    backend = 'sqlite'
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quizzes (
+                    quiz_id TEXT PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    num_questions INTEGER NOT NULL,
+                    num_correct INTEGER NOT NULL,
+                    num_scored INTEGER NOT NULL,
+                    score_sum REAL NOT NULL,
+                    percentage REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_timestamp ON quizzes (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_updated_at ON quizzes (updated_at)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(quizzes)")]
+            if 'user_id' not in columns:
+                conn.execute("ALTER TABLE quizzes ADD COLUMN user_id TEXT")
+                conn.execute("UPDATE quizzes SET user_id = json_extract(data, '$.user_id')")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_user_timestamp ON quizzes (user_id, timestamp)")
+
+    # One connection per thread; SQLite connections are cheap to keep open
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, quiz_id):
+        row = self._connect().execute("SELECT data FROM quizzes WHERE quiz_id = ?", (quiz_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, quiz_id, quiz_data):
+        summary = summarize_quiz(quiz_id, quiz_data)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO quizzes (quiz_id, timestamp, updated_at, num_questions, num_correct, num_scored, score_sum, percentage, user_id, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (quiz_id, summary['timestamp'], time.time(), summary['num_questions'], summary['num_correct'],
+                 summary['num_scored'], summary['score_sum'], summary['percentage'], quiz_data.get('user_id'),
+                 json.dumps(quiz_data, ensure_ascii=False))
+            )
+
+    def exists(self, quiz_id):
+        return self._connect().execute("SELECT 1 FROM quizzes WHERE quiz_id = ?", (quiz_id,)).fetchone() is not None
+
+    def version(self, quiz_id):
+        row = self._connect().execute("SELECT updated_at FROM quizzes WHERE quiz_id = ?", (quiz_id,)).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM quizzes").fetchone()[0]
+
+    # Range conditions on the indexed timestamp column for since/until queries
+    def _range(self, since, until):
+        since, until = _timestamp_bounds(since, until)
+        return (" WHERE timestamp >= ? AND timestamp < ?", (since or '', until or '\uffff'))
+
+    def iter_quizzes(self, since=None, until=None):
+        where, params = self._range(since, until)
+        for quiz_id, data in self._connect().execute(f"SELECT quiz_id, data FROM quizzes{where} ORDER BY timestamp", params):
+            yield quiz_id, json.loads(data)
+
+    # Reads only the summary columns, never the quiz bodies
+    def summaries(self, since=None, until=None):
+        where, params = self._range(since, until)
+        rows = self._connect().execute(
+            "SELECT quiz_id, timestamp, num_questions, num_correct, num_scored, score_sum, percentage "
+            f"FROM quizzes{where} ORDER BY timestamp", params
+        ).fetchall()
+        keys = ["quiz_id", "timestamp", "num_questions", "num_correct", "num_scored", "score_sum", "percentage"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def recent(self, limit):
+        rows = self._connect().execute(
+            "SELECT quiz_id, data FROM quizzes ORDER BY updated_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [(quiz_id, json.loads(data)) for quiz_id, data in rows]
+
+    def recent_for_user(self, user_id, limit):
+        rows = self._connect().execute(
+            "SELECT quiz_id, data FROM quizzes WHERE user_id = ? ORDER BY timestamp DESC, quiz_id DESC LIMIT ?", (user_id, limit)
+        ).fetchall()
+        return [(quiz_id, json.loads(data)) for quiz_id, data in rows]
+
+
+# Quiz repository backed by the MongoDB connection the app already uses
+class MongoQuizStore:
+    backend = 'mongo'
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index('quiz_id', unique=True)
+        self.collection.create_index('timestamp')
+        self.collection.create_index('updated_at')
+        self.collection.create_index([('user_id', 1), ('timestamp', -1)])
+        # Quizzes saved before user_id was a top-level field
+        self.collection.update_many({"user_id": {"$exists": False}, "data.user_id": {"$exists": True}},
+                                    [{"$set": {"user_id": "$data.user_id"}}])
+
+    def get(self, quiz_id):
+        document = self.collection.find_one({"quiz_id": quiz_id}, {"data": 1})
+        return document['data'] if document else None
+
+    def save(self, quiz_id, quiz_data):
+        summary = summarize_quiz(quiz_id, quiz_data)
+        summary.update({"updated_at": time.time(), "user_id": quiz_data.get('user_id'), "data": quiz_data})
+        self.collection.replace_one({"quiz_id": quiz_id}, summary, upsert=True)
+
+    def exists(self, quiz_id):
+        return self.collection.count_documents({"quiz_id": quiz_id}, limit=1) > 0
+
+    def version(self, quiz_id):
+        document = self.collection.find_one({"quiz_id": quiz_id}, {"updated_at": 1})
+        return document['updated_at'] if document else None
+
+    def count(self):
+        return self.collection.estimated_document_count()
+
+    def _range(self, since, until):
+        since, until = _timestamp_bounds(since, until)
+        bounds = {}
+        if since:
+            bounds["$gte"] = since
+        if until:
+            bounds["$lt"] = until
+        return {"timestamp": bounds} if bounds else {}
+
+    def iter_quizzes(self, since=None, until=None):
+        for document in self.collection.find(self._range(since, until), {"quiz_id": 1, "data": 1}).sort('timestamp', 1):
+            yield document['quiz_id'], document['data']
+
+    def summaries(self, since=None, until=None):
+        projection = {"_id": 0, "data": 0, "updated_at": 0, "user_id": 0}
+        return list(self.collection.find(self._range(since, until), projection).sort('timestamp', 1))
+
+    def recent(self, limit):
+        cursor = self.collection.find({}, {"quiz_id": 1, "data": 1}).sort('updated_at', -1).limit(limit)
+        return [(document['quiz_id'], document['data']) for document in cursor]
+
+    def recent_for_user(self, user_id, limit):
+        cursor = self.collection.find({"user_id": user_id}, {"quiz_id": 1, "data": 1}).sort([('timestamp', -1), ('quiz_id', -1)]).limit(limit)
+        return [(document['quiz_id'], document['data']) for document in cursor]
+
+
+# LRU of parsed quizzes in front of another store, with write-through saves.
+# Every hit is checked against the store's version marker (file mtime or updated_at),
+# so changes made outside this process are picked up on the next read.
+class CachedQuizStore:
+    def __init__(self, inner, max_entries=512, ttl_seconds=600):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _remember(self, quiz_id, quiz_data, version):
+        with self._lock:
+            self._entries[quiz_id] = (copy.deepcopy(quiz_data), version, time.time())
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    # Returns a copy, so callers can modify the quiz without touching the cached one
+    def get(self, quiz_id):
+        version = self.inner.version(quiz_id)
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is not None:
+                quiz_data, cached_version, loaded_at = entry
+                if cached_version == version and time.time() - loaded_at < self.ttl_seconds:
+                    self._entries.move_to_end(quiz_id)
+                    self.counters["hits"] += 1
+                    return copy.deepcopy(quiz_data)
+                del self._entries[quiz_id]
+                self.counters["stale"] += 1
+            self.counters["misses"] += 1
+        if version is None:
+            return None
+        quiz_data = self.inner.get(quiz_id)
+        if quiz_data is not None:
+            self._remember(quiz_id, quiz_data, version)
+        return quiz_data
+
+    def save(self, quiz_id, quiz_data):
+        self.inner.save(quiz_id, quiz_data)
+        self._remember(quiz_id, quiz_data, self.inner.version(quiz_id))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        return stats
+
+
+# Function to create the configured quiz repository
+def create_quiz_store(backend, quiz_dir, sqlite_path=None, mongo_db=None):
+    if backend == 'files':
+        return FileQuizStore(quiz_dir)
+    if backend == 'sqlite':
+        return SQLiteQuizStore(sqlite_path)
+    if backend == 'mongo':
+        return MongoQuizStore(mongo_db.quizzes)
+    raise ValueError(f"Unknown quiz store backend: {backend}")
+
+
+# Function to copy every JSON quiz file into another store; returns the number imported
+def import_json_quizzes(store, quiz_dir, overwrite=False):
+    source = FileQuizStore(quiz_dir)
+    imported = 0
+    for quiz_id, quiz_data in source.iter_quizzes():
+        if 'questions' not in quiz_data:
+            logger.warning(f"Invalid format for {quiz_id}.json, skipping import")
+            continue
+        if not overwrite and store.exists(quiz_id):
+            continue
+        store.save(quiz_id, quiz_data)
+        imported += 1
+    logger.info(f"Imported {imported} quizzes from {quiz_dir} into the {store.backend} store")
+    return imported
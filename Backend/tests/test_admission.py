@@ -0,0 +1,40 @@
+import pytest
+
+from admission import AdmissionController, AdmissionLane, Overloaded, RateLimiter
+
+
+def controller(chat=(2, 20), quiz=(1, 10)):
+    return AdmissionController(
+        [AdmissionLane("chat", chat[0], chat[1], 1), AdmissionLane("quiz", quiz[0], quiz[1], 1)],
+        RateLimiter({})
+    )
+
+
+def threads_needed(admission):
+    return sum(lane.max_concurrent + lane.max_queue for lane in admission.lanes.values())
+
+
+def test_queues_shrink_to_fit_the_server_threads():
+    admission = controller()
+    assert admission.limit_threads(12)
+    assert threads_needed(admission) <= 12
+    assert admission.lanes["chat"].max_concurrent == 2
+    assert admission.lanes["quiz"].max_concurrent == 1
+
+
+def test_settings_that_fit_are_left_alone():
+    admission = controller(chat=(2, 6), quiz=(1, 3))
+    assert not admission.limit_threads(12)
+    assert threads_needed(admission) == 12
+
+
+def test_without_queue_room_requests_are_rejected_instead_of_waiting():
+    admission = controller(chat=(3, 5), quiz=(2, 5))
+    admission.limit_threads(3)
+    assert threads_needed(admission) <= 3
+    lane = admission.lanes["chat"]
+    tickets = [lane.enter() for _ in range(lane.max_concurrent)]
+    with pytest.raises(Overloaded):
+        lane.enter()
+    for ticket in tickets:
+        ticket.release()
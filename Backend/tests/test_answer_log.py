@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from answer_log import AnswerLog
+from quiz_ids import new_quiz_id
+from quiz_store import FileQuizStore
+
+
+def apply_answers(quiz_data, answers):
+    for answer in answers:
+        quiz_data['questions'][answer['question_index']]['user_answer'] = answer['user_answer']
+    return quiz_data
+
+
+def test_compact_applies_the_log_whatever_the_write_mode(tmp_path):
+    # Answers logged in log mode, compacted after switching to rewrite mode
+    (tmp_path / 'quizzes').mkdir()
+    store = FileQuizStore(str(tmp_path / 'quizzes'))
+    answer_log = AnswerLog(str(tmp_path / 'answer_logs'))
+    quiz_id = new_quiz_id(datetime(2025, 3, 1, 9, 0, 0))
+    store.save(quiz_id, {"questions": [{"question": "Q1"}, {"question": "Q2"}], "timestamp": "2025-03-01_09-00-00"})
+    answer_log.append(quiz_id, [{"question_index": 0, "user_answer": "A"}])
+    answer_log.append(quiz_id, [{"question_index": 1, "user_answer": "B"}])
+
+    assert answer_log.compact(quiz_id, store, apply_answers) == 2
+
+    questions = store.get(quiz_id)['questions']
+    assert [q.get('user_answer') for q in questions] == ["A", "B"]
+    assert answer_log.read(quiz_id) == []
+    assert answer_log.pending_quiz_ids() == []
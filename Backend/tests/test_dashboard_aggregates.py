@@ -0,0 +1,87 @@
+import random
+from datetime import datetime, timedelta
+
+from dashboard_aggregates import DashboardAggregates
+
+NOW = datetime(2025, 3, 10, 14, 30, 15, 250000)
+
+
+def summary(questions=5, score=3.0):
+    return {"num_questions": questions, "num_scored": questions, "score_sum": score}
+
+
+def last_week_sessions(timestamps, now):
+    return sum(1 for timestamp in timestamps if timestamp < now - timedelta(days=7))
+
+
+def test_last_week_cutoff_is_exact(tmp_path):
+    aggregates = DashboardAggregates(str(tmp_path / 'aggregates.json'))
+    cutoff = NOW - timedelta(days=7)
+    entries = [
+        (cutoff.replace(microsecond=0) + timedelta(seconds=1), summary()),  # just inside the window
+        (cutoff.replace(microsecond=0), summary()),                         # just before the cutoff
+        (NOW - timedelta(days=6, hours=23), summary()),
+        (NOW - timedelta(days=7, hours=1), summary())
+    ]
+    aggregates.rebuild(entries, now=NOW - timedelta(days=1))
+    totals = aggregates.totals(now=NOW)
+    assert totals["total_sessions"] == 4
+    assert totals["last_week_sessions"] == 2
+    assert totals["last_week_questions"] == 10
+
+
+def test_matches_full_scan(tmp_path):
+    rng = random.Random(7)
+    for trial in range(100):
+        aggregates = DashboardAggregates(str(tmp_path / f'aggregates-{trial}.json'))
+        start = NOW - timedelta(days=10)
+        timestamps = sorted(
+            (start + timedelta(seconds=rng.randrange(10 * 24 * 3600))).replace(microsecond=0) for _ in range(20)
+        )
+        aggregates.rebuild([], now=start)
+        for timestamp in timestamps:
+            aggregates.record_quiz(timestamp, summary())
+        now = NOW + timedelta(seconds=rng.randrange(3 * 24 * 3600), microseconds=rng.randrange(10 ** 6))
+        assert aggregates.totals(now=now)["last_week_sessions"] == last_week_sessions(timestamps, now)
+
+
+def test_old_layouts_are_rebuilt(tmp_path):
+    path = tmp_path / 'aggregates.json'
+    for old_state in ('{"days": {}}', '{"buckets": {}}'):
+        path.write_text(old_state, encoding='utf-8')
+        assert not DashboardAggregates(str(path)).exists()
+
+
+def test_journal_is_replayed_and_snapshotted(tmp_path):
+    path = str(tmp_path / 'aggregates.json')
+    aggregates = DashboardAggregates(path, snapshot_every=4)
+    aggregates.rebuild([], now=NOW - timedelta(days=10))
+    start = NOW.replace(microsecond=0)
+    for day in range(10):
+        aggregates.record_quiz(start - timedelta(days=10 - day), summary())
+    aggregates.update_quiz(start - timedelta(days=1), summary(score=3.0), summary(score=5.0))
+    expected = aggregates.totals(now=NOW)
+
+    # 11 changes with a snapshot every 4: the last 3 exist only in the journal
+    with open(f"{path}.journal", encoding='utf-8') as f:
+        assert len(f.readlines()) == 3
+    reloaded = DashboardAggregates(path, snapshot_every=4)
+    assert reloaded.exists()
+    assert reloaded.totals(now=NOW) == expected
+    assert expected["total_sessions"] == 10
+    assert expected["score_sum"] == 32.0
+    assert expected["last_week_sessions"] == 4
+
+
+def test_journal_entries_already_in_the_snapshot_are_skipped(tmp_path):
+    path = str(tmp_path / 'aggregates.json')
+    aggregates = DashboardAggregates(path, snapshot_every=2)
+    aggregates.rebuild([], now=NOW)
+    aggregates.record_quiz(NOW, summary())
+    with open(f"{path}.journal", encoding='utf-8') as f:
+        journal = f.read()
+    aggregates.record_quiz(NOW + timedelta(days=1), summary())
+    # A crash after the snapshot was written but before the journal was emptied
+    with open(f"{path}.journal", 'w', encoding='utf-8') as f:
+        f.write(journal)
+    assert DashboardAggregates(path).totals(now=NOW)["total_sessions"] == 2
@@ -0,0 +1,40 @@
+import pytest
+
+from dedup_index import NearDuplicateIndex
+
+# Paraphrases the quiz generator produces across batches; each pair must be caught at the default threshold
+PARAPHRASES = [
+    ("What is the primary function of mitochondria?", "What is the main function of the mitochondria?"),
+    ("Which organelle produces energy for the cell?", "Which organelle produces the energy for cells?"),
+    ("What is the key role of chlorophyll in photosynthesis?", "In photosynthesis, what is the main role of chlorophyll?"),
+    ("Mitochondria are the powerhouse of the cell.", "The mitochondria is the powerhouse of a cell."),
+]
+
+# Questions that share a topic but ask something different
+DISTINCT = [
+    ("What is the primary function of mitochondria?", "What is the primary function of ribosomes?"),
+    ("What gas do plants absorb during photosynthesis?", "What gas do plants release during photosynthesis?"),
+    ("What is the function of the nucleus?", "Where is the nucleus located in the cell?"),
+]
+
+
+@pytest.mark.parametrize("first, second", PARAPHRASES)
+def test_paraphrases_are_duplicates(first, second):
+    index = NearDuplicateIndex()
+    index.add(first)
+    assert index.is_duplicate(second)
+
+
+@pytest.mark.parametrize("first, second", DISTINCT)
+def test_different_questions_are_kept(first, second):
+    index = NearDuplicateIndex()
+    index.add(first)
+    assert not index.is_duplicate(second)
+
+
+def test_add_if_new():
+    index = NearDuplicateIndex()
+    assert index.add_if_new(PARAPHRASES[0][0])
+    assert not index.add_if_new(PARAPHRASES[0][1])
+    assert index.add_if_new(DISTINCT[0][1])
+    assert len(index) == 2
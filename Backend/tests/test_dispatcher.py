@@ -0,0 +1,20 @@
+import threading
+
+from dispatcher import WorkDispatcher
+
+
+def test_cancelled_queued_work_leaves_the_queue():
+    dispatcher = WorkDispatcher({"llm": 1})
+    started, release = threading.Event(), threading.Event()
+    running = dispatcher.submit("llm", lambda: (started.set(), release.wait()))
+    assert started.wait(timeout=5)
+    queued = [dispatcher.submit("llm", lambda: None) for _ in range(3)]
+    assert dispatcher.stats()["llm"]["queued"] == 3
+
+    assert all(future.cancel() for future in queued)
+    assert dispatcher.stats()["llm"] == {"workers": 1, "active": 1, "queued": 0}
+
+    release.set()
+    running.result(timeout=5)
+    assert dispatcher.stats()["llm"]["active"] == 0
+    dispatcher.shutdown()
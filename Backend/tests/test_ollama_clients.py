@@ -0,0 +1,72 @@
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_ollama")
+
+from dispatcher import WorkDispatcher
+from ollama_clients import OllamaClientManager
+
+
+# A server that accepts connections and reads requests but never answers, like a hung Ollama.
+# Yields its URL and the list of connections it has accepted.
+@pytest.fixture
+def stalled_server():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    connections = []
+    stop = threading.Event()
+
+    def accept():
+        listener.settimeout(0.1)
+        while not stop.is_set():
+            try:
+                connection, _ = listener.accept()
+                connections.append(connection)
+            except socket.timeout:
+                continue
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}", connections
+    stop.set()
+    thread.join()
+    for connection in connections:
+        connection.close()
+    listener.close()
+
+
+def test_stalled_backend_releases_the_worker(stalled_server):
+    url, _ = stalled_server
+    manager = OllamaClientManager([url], probe_timeout=0.2, request_timeout=0.5)
+    model = manager.chat_model(task="mcq", model="mistral:latest")
+    dispatcher = WorkDispatcher({"llm": 1})
+
+    start = time.time()
+    future = dispatcher.submit("llm", model.invoke, "Hello")
+    with pytest.raises(Exception):
+        future.result(timeout=10)
+    assert time.time() - start < 5
+    assert dispatcher.stats()["llm"]["active"] == 0
+    assert manager.stats()[0]["in_flight"] == 0
+    dispatcher.shutdown()
+
+
+def test_chat_models_share_the_connection_pool(stalled_server):
+    url, connections = stalled_server
+    manager = OllamaClientManager([url], probe_timeout=0.2, pool_connections=1, request_timeout=0.5)
+    models = [manager.chat_model(task=task, model="mistral:latest") for task in ("mcq", "chat", "summarize")]
+    dispatcher = WorkDispatcher({"llm": len(models)})
+
+    futures = [dispatcher.submit("llm", model.invoke, "Hello") for model in models]
+    # While the calls hang (and before failures trigger health probes) the endpoint has one
+    # pooled connection, not one per pipeline
+    time.sleep(0.3)
+    assert len(connections) == 1
+    for future in futures:
+        with pytest.raises(Exception):
+            future.result(timeout=10)
+    dispatcher.shutdown()
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from quiz_ids import new_quiz_id
+from quiz_store import FileQuizStore, SQLiteQuizStore
+
+START = datetime(2025, 3, 1, 9, 0, 0)
+
+
+def quiz(user_id, number):
+    created = START + timedelta(hours=number)
+    data = {"questions": [{"question": f"Question {number}"}], "timestamp": created.strftime('%Y-%m-%d_%H-%M-%S')}
+    if user_id:
+        data["user_id"] = user_id
+    return new_quiz_id(created), data
+
+
+@pytest.fixture(params=['files', 'sqlite'])
+def make_store(request, tmp_path):
+    def make():
+        if request.param == 'files':
+            return FileQuizStore(str(tmp_path / 'quizzes'))
+        return SQLiteQuizStore(str(tmp_path / 'quizzes.sqlite3'))
+    (tmp_path / 'quizzes').mkdir()
+    return make
+
+
+def test_recent_for_user_is_not_limited_to_the_global_recent(make_store):
+    store = make_store()
+    saved = []
+    for number in range(5):
+        quiz_id, data = quiz("alice", number)
+        store.save(quiz_id, data)
+        saved.append(quiz_id)
+    # Other users' quizzes push alice's out of the global last 20
+    for number in range(5, 30):
+        store.save(*quiz("bob", number))
+
+    assert all(data.get("user_id") == "bob" for _, data in store.recent(20))
+    recent = store.recent_for_user("alice", 3)
+    assert [quiz_id for quiz_id, _ in recent] == list(reversed(saved))[:3]
+    assert store.recent_for_user("carol", 3) == []
+
+
+def test_file_store_indexes_existing_quizzes(tmp_path):
+    directory = tmp_path / 'quizzes'
+    directory.mkdir()
+    store = FileQuizStore(str(directory))
+    quiz_id, data = quiz("alice", 1)
+    store.save(quiz_id, data)
+    # A store created before the per-user index existed
+    for index_file in (directory / '_users').iterdir():
+        index_file.unlink()
+    (directory / '_users').rmdir()
+
+    reopened = FileQuizStore(str(directory))
+    assert [q for q, _ in reopened.recent_for_user("alice", 5)] == [quiz_id]
+    assert [q for q, _ in reopened.recent(5)] == [quiz_id]
@@ -0,0 +1,203 @@
+import contextvars
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Lightweight request tracing: a trace per request (or background job) holding nested timed spans.
+#   with span("parse", quiz_type="mcq"):
+#       ...
+# opens a child of the current span and is a no-op outside a trace. The current span lives in a
+# context variable, so work handed to another thread must be wrapped with bind() to stay in the trace.
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_REQUEST_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.id = next(trace._ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def seconds(self):
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.root.start) * 1000, 2),
+            "duration_ms": round(self.seconds * 1000, 2),
+            "attrs": self.attrs
+        }
+
+
+class Trace:
+    def __init__(self, name, request_id=None, sampled=False, **attrs):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.sampled = sampled
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.root = self.open(name, None, attrs)
+
+    def open(self, name, parent_id, attrs):
+        span = Span(self, name, parent_id, attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self, **attrs):
+        if self.root.end is None:
+            self.root.set(**attrs)
+            self.root.end = time.time()
+
+    # Total time and count per span name, in the order the names first appeared
+    def breakdown(self):
+        totals = {}
+        with self._lock:
+            spans = list(self.spans[1:])
+        for span in spans:
+            seconds, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (seconds + span.seconds, count + 1)
+        return totals
+
+    # Breakdown as a Server-Timing header value (shown by browser dev tools)
+    def server_timing(self, max_entries=20):
+        entries = [f'total;dur={self.root.seconds * 1000:.1f}']
+        for name, (seconds, count) in list(self.breakdown().items())[:max_entries]:
+            metric = re.sub(r'[^\w.-]', '_', name)
+            entries.append(f'{metric};dur={seconds * 1000:.1f};desc="{count}x"')
+        return ', '.join(entries)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "request_id": self.request_id,
+            "name": self.root.name,
+            "timestamp": self.root.start,
+            "duration_ms": round(self.root.seconds * 1000, 2),
+            "spans": [span.to_dict() for span in spans]
+        }
+
+
+# Function to accept a caller's request id if it looks safe to log, else make a new one
+def request_id_from(header_value):
+    if header_value and _REQUEST_ID_PATTERN.match(header_value):
+        return header_value
+    return uuid.uuid4().hex
+
+
+def current_span():
+    return _current_span.get()
+
+
+# Make `trace` the current trace of this thread until detach(); finishing it is up to the caller
+def start_trace(trace):
+    _current_span.set(trace.root)
+    return trace
+
+
+def detach():
+    _current_span.set(None)
+
+
+# Trace a block of work outside a request, e.g. a background job
+@contextmanager
+def traced(name, exporter=None, request_id=None, **attrs):
+    trace = Trace(name, request_id, exporter.should_sample() if exporter else False, **attrs)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.set(error=str(e)[:200])
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.finish()
+        if exporter:
+            exporter.export(trace)
+
+
+@contextmanager
+def span(name, **attrs):
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.open(name, parent.id, attrs)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set(error=str(e)[:200])
+        raise
+    finally:
+        child.end = time.time()
+        _current_span.reset(token)
+
+
+# Wrap fn so that it runs inside the caller's current span when called from another thread
+def bind(fn):
+    parent = _current_span.get()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run
+
+
+# Appends finished traces as JSON lines: a random sample_rate share of them, plus every trace
+# slower than slow_seconds (0 disables). The file is rotated to <path>.1 when it reaches max_bytes.
+class TraceExporter:
+    def __init__(self, path, sample_rate=0.0, slow_seconds=0.0, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_bytes = max_bytes
+        self.exported = 0
+        self._lock = threading.Lock()
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def export(self, trace):
+        if not (trace.sampled or (self.slow_seconds > 0 and trace.root.seconds >= self.slow_seconds)):
+            return False
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.exported += 1
+        return True
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "slow_seconds": self.slow_seconds,
+            "exported": self.exported
+        }
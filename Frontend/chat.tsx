@@ -2,6 +2,7 @@
 
 import type React from "react"
 import { useState, useRef, useEffect } from "react"
+import { parseCookies } from "nookies"
 import { Button } from "@/components/ui/button"
 import { Textarea } from "@/components/ui/textarea"
 import { Loader2, Send, Moon, Sun, Copy, Menu, PenSquare } from "lucide-react"
@@ -14,6 +15,12 @@ import { Prism as SyntaxHighlighter, SyntaxHighlighterProps } from "react-syntax
 import { vs, vs2015 } from "react-syntax-highlighter/dist/esm/styles/hljs"
 import { v4 as uuidv4 } from 'uuid'
 
+// Send the login token so the backend rate-limits per user rather than per IP address
+const authHeaders = (): Record<string, string> => {
+  const { token } = parseCookies()
+  return token ? { Authorization: `Bearer ${token}` } : {}
+}
+
 interface Message {
   id: string
   content: string
@@ -149,6 +156,7 @@ export default function ChatPage() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
         body: JSON.stringify({ question: userMessage.content }),
       })
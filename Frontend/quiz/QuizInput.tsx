@@ -1,6 +1,7 @@
 "use client";
 
 import { useState } from "react";
+import { parseCookies } from "nookies";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -29,6 +30,12 @@ import {
 import { FileUp, FileText, Loader2, Brain, AlertCircle } from "lucide-react";
 import { Alert, AlertTitle, AlertDescription } from "@/components/ui/alert";
 
+// Send the login token so the backend rate-limits per user rather than per IP address
+const authHeaders = (): Record<string, string> => {
+  const { token } = parseCookies();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 type QuestionType = "multiple-choice" | "true-false" | "fill-in-the-blank";
 type DifficultyLevel = "easy" | "medium" | "hard";
 
@@ -103,7 +110,7 @@ export default function QuizInput({ onGenerate }: QuizInputProps) {
     const generateQuizAttempt = async (): Promise<QuizQuestion[]> => {
       const response = await fetch("http://localhost:5000/generate_quiz", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...authHeaders() },
         body: JSON.stringify({
           text: material,
           question_type: questionType,
@@ -1,6 +1,7 @@
 "use client";
 
 import { useState } from "react";
+import { parseCookies } from "nookies";
 import { useRouter } from "next/navigation";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardDescription, CardFooter, CardHeader, CardTitle } from "@/components/ui/card";
@@ -93,7 +94,7 @@ export default function QuizApp() {
     const generateQuizAttempt = async (): Promise<QuizQuestion[]> => {
       const response = await fetch("http://localhost:5000/generate_quiz", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...authHeaders() },
         body: JSON.stringify({
           text: material,
           question_type: questionType,
@@ -489,6 +490,12 @@ import { Brain, FileUp, Loader2, CheckCircle, XCircle, ArrowLeft, ArrowRight, Ho
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 import { AlertCircle } from "lucide-react";
 
+// Send the login token so the backend rate-limits per user rather than per IP address
+const authHeaders = (): Record<string, string> => {
+  const { token } = parseCookies();
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
 // Define interfaces for quiz data
 interface QuizQuestion {
   type: "mcq" | "true_false" | "fill_in_the_blank";
@@ -571,7 +578,7 @@ export default function QuizApp() {
     try {
       const response = await fetch("http://localhost:5000/generate_quiz", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...authHeaders() },
         body: JSON.stringify({
           text: material, // Changed from 'material' to 'text' to match backend
           question_type: questionType,
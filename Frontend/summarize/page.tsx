@@ -3,6 +3,7 @@
 import type React from "react"
 
 import { useState } from "react"
+import { parseCookies } from "nookies"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardDescription, CardFooter, CardHeader, CardTitle } from "@/components/ui/card"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
@@ -12,6 +13,12 @@ import { Label } from "@/components/ui/label"
 import { FileText, FileUp, Loader2 } from "lucide-react"
 import { useToast } from "@/hooks/use-toast"
 
+// Send the login token so the backend rate-limits per user rather than per IP address
+const authHeaders = (): Record<string, string> => {
+  const { token } = parseCookies()
+  return token ? { Authorization: `Bearer ${token}` } : {}
+}
+
 export default function SummarizePage() {
   const [activeTab, setActiveTab] = useState("text")
   const [text, setText] = useState("")
@@ -77,9 +84,10 @@ export default function SummarizePage() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...authHeaders(),
         },
         body: JSON.stringify({
-          question: `Please provide a concise summary of the following text: ${text.substring(0, 2000)}...`,
+          question: `Please provide a concise summary of the following text: ${text}`,
         }),
       })
 